@@ -1,5 +1,10 @@
 import pandas as pd
+import os
 import re
+import shutil
+import tempfile
+import time
+from collections import deque
 import emoji
 import contractions
 import spacy
@@ -15,10 +20,18 @@ This script cleans tweet text by:
 5. Removing emojis and converting to lowercase → 'Text_Clean'
 6. Lemmatizing 'Text_Clean' → 'Text_Lemm'
 Processed columns are appended to the original CSV files.
+The columns are built by the compiled normalizer (normalize_nolink / normalize_clean), which
+gives the same output as the step-by-step functions below in far fewer passes.
+Files are streamed in chunks to a temp file that atomically replaces the original at the end,
+so memory stays flat and an interrupted run leaves the input untouched.
 """
 
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
+# Load spaCy model (only the tagger/attribute ruler/lemmatizer are needed for token.lemma_)
+nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+
+# Lemmatization settings: docs per nlp.pipe batch and worker processes
+lemm_batch_size = 1000
+lemm_n_process = 1
 
 # Load abbreviation dictionary from CSV
 data_folder = "path/to/data"
@@ -60,6 +73,84 @@ def clean_text(text):
     return text.lower().strip()  # Convert to lowercase without removing punctuation
 
 
+# Compiled normalizer: same output as remove_urls_mentions and clean_text above.
+# URLs and mentions in one pass; a mention stops where a URL starts, just as when URLs were removed first.
+url_mention_pattern = re.compile(r"(?:http|www)\S+|@(?:(?!http\S|www\S)\w)+")
+
+# Emoji made only of word characters (e.g. 'ℹ') are the only ones left after punctuation removal
+word_emoji = sorted((e for e in emoji.EMOJI_DATA if re.fullmatch(r"\w+", e)), key=len, reverse=True)
+word_emoji_pattern = "|".join(map(re.escape, word_emoji))
+
+
+# Function to build the single-pass cleaning regex: whole-token abbreviations | whitespace runs | emoji | punctuation
+def build_clean_pattern(abbreviations):
+    def strip_meaning(meaning):
+        meaning = remove_punctuation(meaning)
+        return re.sub(word_emoji_pattern, "", meaning) if word_emoji else meaning
+
+    meanings = {abbr: strip_meaning(meaning) for abbr, meaning in abbreviations.items()
+                if isinstance(abbr, str) and isinstance(meaning, str) and abbr and not re.search(r"\s", abbr)}
+    parts = []
+    if meanings:
+        keys = sorted(meanings, key=len, reverse=True)
+        parts.append(r"(?<!\S)(?P<abbr>" + "|".join(map(re.escape, keys)) + r")(?!\S)")
+    parts.append(r"(?P<space>\s+)")  # split()/join() collapsed whitespace runs to one space
+    if word_emoji:
+        parts.append(word_emoji_pattern)
+    parts.append(r"[^\w\s']+")
+    pattern = re.compile("|".join(parts), re.IGNORECASE)
+
+    def replace(match):
+        if meanings and match.group("abbr") is not None:
+            return meanings[match.group("abbr").lower()]
+        if match.group("space") is not None:
+            return " "
+        return ""
+
+    return pattern, replace
+
+
+clean_pattern, clean_replace = build_clean_pattern(abbreviation_dict)
+
+
+# Function to remove URLs and mentions in one pass → 'Text_nolink'
+def normalize_nolink(text):
+    return url_mention_pattern.sub("", text).strip()
+
+
+# Function to clean text with contractions.fix plus one compiled pass → 'Text_Clean'
+def normalize_clean(text):
+    return clean_pattern.sub(clean_replace, contractions.fix(text)).lower().strip()
+
+
+# Function to compare the compiled normalizer against the step-by-step functions on real tweets
+def check_normalizer(file_paths):
+    mismatches = 0
+    total = 0
+    for file_path in file_paths:
+        for text in pd.read_csv(file_path, usecols=["Text"], dtype=str)["Text"].astype(str):
+            total += 1
+            expected_nolink = remove_urls_mentions(text)
+            expected_clean = clean_text(expected_nolink)
+            if normalize_nolink(text) != expected_nolink or normalize_clean(expected_nolink) != expected_clean:
+                mismatches += 1
+                print(f"Mismatch: {text!r}")
+    print(f"Normalizer check: {mismatches} mismatches in {total} texts")
+    return mismatches == 0
+
+
+# Function to report throughput of the step-by-step and compiled normalizers
+def benchmark_normalizer(file_paths):
+    texts = pd.concat([pd.read_csv(f, usecols=["Text"], dtype=str)["Text"] for f in file_paths]).astype(str).tolist()
+    for name, normalize in [("step-by-step", lambda t: clean_text(remove_urls_mentions(t))),
+                            ("compiled", lambda t: normalize_clean(normalize_nolink(t)))]:
+        start = time.perf_counter()
+        for text in texts:
+            normalize(text)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(texts) / elapsed:.0f} texts/sec ({len(texts)} texts in {elapsed:.1f}s)")
+
+
 # Function to lemmatize text
 def lemmatize_text(text):
     doc = nlp(text)
@@ -67,31 +158,139 @@ def lemmatize_text(text):
     return " ".join(lemmatized_words)
 
 
+# Function to lemmatize a stream of texts in batches, yielding in input order (same output as lemmatize_text on each)
+def lemmatize_stream(texts, batch_size=None, n_process=None):
+    docs = nlp.pipe(texts, batch_size=batch_size or lemm_batch_size, n_process=n_process or lemm_n_process)
+    for doc in docs:
+        yield " ".join(token.lemma_ for token in doc)
+
+
+# Function to lemmatize a list of texts
+def lemmatize_texts(texts, batch_size=None, n_process=None):
+    return list(lemmatize_stream(texts, batch_size, n_process))
+
+
 # Define file paths
 fluoride_file = data_folder + "fluoride.csv"
 user_file = data_folder + "user.csv"
 common_users_file = data_folder + "common.csv"
 
+# Rows read, cleaned and written at a time
+chunksize = 5000
 
-# Function to process the dataset
-def process_file(file_path):
-    df = pd.read_csv(file_path)
 
-    if "Text" not in df.columns:
+# Function to add the normalized columns to one chunk of rows
+def normalize_chunk(df):
+    df["Text_nolink"] = df["Text"].astype(str).apply(normalize_nolink)
+    df["Text_Clean"] = df["Text_nolink"].apply(normalize_clean)
+    return df
+
+
+# Function to clean one chunk of rows on its own
+def process_chunk(df):
+    df = normalize_chunk(df)
+    df["Text_Lemm"] = lemmatize_texts(df["Text_Clean"].tolist())
+    return df
+
+
+# Function to yield the cleaned chunks of a file, with one nlp.pipe over the whole Text_Clean stream
+# (so n_process > 1 starts its worker pool once per file, not once per chunk); a chunk is yielded
+# as soon as all of its lemmas are back
+def cleaned_chunks(file_path):
+    pending = deque()  # Normalized chunks still waiting for lemmas
+
+    def clean_texts():
+        # Read every column as text so each chunk round-trips IDs exactly, whatever the other chunks hold
+        for chunk in pd.read_csv(file_path, chunksize=chunksize, dtype=str):
+            pending.append(normalize_chunk(chunk))
+            yield from chunk["Text_Clean"].tolist()
+
+    lemmas = []
+    for lemma in lemmatize_stream(clean_texts()):
+        lemmas.append(lemma)
+        if len(lemmas) == len(pending[0]):
+            chunk = pending.popleft()
+            chunk["Text_Lemm"] = lemmas
+            lemmas = []
+            yield chunk
+
+
+# Function to compare the streamed Text_Lemm against the full en_core_web_sm pipeline (parser and NER included)
+# run on each row, which is how Text_Lemm was built before the pipeline was trimmed and batched
+def check_lemmatization(file_paths):
+    full_nlp = spacy.load("en_core_web_sm")
+    mismatches = 0
+    total = 0
+    for file_path in file_paths:
+        for chunk in cleaned_chunks(file_path):
+            for text, lemma in zip(chunk["Text_Clean"], chunk["Text_Lemm"]):
+                total += 1
+                if " ".join(token.lemma_ for token in full_nlp(text)) != lemma:
+                    mismatches += 1
+                    print(f"Mismatch: {text!r}")
+    print(f"Lemmatization check: {mismatches} mismatches in {total} texts")
+    return mismatches == 0
+
+
+# Function to process the dataset chunk by chunk and atomically replace it
+def process_file(file_path):
+    if "Text" not in pd.read_csv(file_path, nrows=0).columns:
         print(f"Skipping {file_path} - 'Text' column missing.")
         return
 
-    df["Text_nolink"] = df["Text"].astype(str).apply(remove_urls_mentions)
-    df["Text_Clean"] = df["Text_nolink"].apply(clean_text)
-    df["Text_Lemm"] = df["Text_Clean"].apply(lemmatize_text)
-
-    df.to_csv(file_path, index=False, encoding="utf-8")
+    # The temp file sits next to the target so os.replace stays on one filesystem
+    fd, temp_path = tempfile.mkstemp(suffix=".csv.tmp", dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+            rows = 0
+            for chunk in cleaned_chunks(file_path):
+                chunk.to_csv(out, index=False, header=(rows == 0))
+                rows += len(chunk)
+                print(f"Cleaned {rows} rows of {file_path}")
+            if rows == 0:
+                process_chunk(pd.read_csv(file_path, nrows=0, dtype=str)).to_csv(out, index=False)
+            out.flush()
+            os.fsync(out.fileno())
+        shutil.copymode(file_path, temp_path)  # mkstemp creates the file owner-only; keep the original's mode
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
     print(f"Processed and saved: {file_path}")
 
 
-# Process all files
-process_file(fluoride_file)
-process_file(user_file)
-process_file(common_users_file)
+# Function to report nlp.pipe throughput at 1, 2, 4 and all cores on the first max_rows rows; the texts are
+# normalized beforehand, so only the lemmatization stage is timed
+def benchmark_lemmatization(file_path, max_rows=20000):
+    texts = normalize_chunk(pd.read_csv(file_path, nrows=max_rows, dtype=str))["Text_Clean"].tolist()
+    for n_process in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        lemmatize_texts(texts, n_process=n_process)
+        elapsed = time.perf_counter() - start
+        print(f"n_process={n_process}: {len(texts) / elapsed:.0f} docs/sec ({len(texts)} docs in {elapsed:.1f}s)")
+
+
+# Labeled posts used to check and benchmark the normalizer
+sample_files = [data_folder + "fluoride_posts.csv", data_folder + "general_posts.csv"]
+
+# "clean" processes the files; "benchmark_lemm", "check_lemm", "check_normalizer" and "benchmark_normalizer"
+# run diagnostics
+run_task = "clean"
+
+# Guarded so worker processes (n_process > 1) can import this file without re-running it
+if __name__ == "__main__":
+    if run_task == "benchmark_lemm":
+        benchmark_lemmatization(fluoride_file)
+    elif run_task == "check_lemm":
+        check_lemmatization(sample_files)
+    elif run_task == "check_normalizer":
+        check_normalizer(sample_files)
+    elif run_task == "benchmark_normalizer":
+        benchmark_normalizer(sample_files)
+    else:
+        # Process all files
+        process_file(fluoride_file)
+        process_file(user_file)
+        process_file(common_users_file)
 
-print("Text cleaning completed.")
+        print("Text cleaning completed.")
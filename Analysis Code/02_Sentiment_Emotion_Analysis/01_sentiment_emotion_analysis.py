@@ -3,12 +3,31 @@ import pandas as pd
 import time
 import os
 import re  # Import regex for better parsing
-
-# Load API Key
-with open("D:/openai_key.txt", "r") as file:
-    api_key = file.read().strip()
-
-client = openai.OpenAI(api_key=api_key)
+from classification_engine import ClassificationEngine, estimate_tokens
+from results_journal import ResultsJournal, merge_journal
+from response_cache import ResponseCache, cache_key
+from bulk_jobs import write_request_files, read_results, result_files, pending_ids
+from local_classifier import LocalClassifier, train_and_report
+
+# Set to e.g. "http://127.0.0.1:8000/v1" to run against fake_chat_server.py instead of OpenAI
+api_base_url = None
+api_key_file = "D:/openai_key.txt"
+client = None  # Created by openai_client() on the first request, so "train_local" runs without a key
+
+
+def openai_client():
+    # max_retries=0: the SDK must not retry 429s itself, so every attempt goes through the
+    # engine's rate limiter and backoff (classification_engine.py)
+    global client
+    if client is None:
+        if api_base_url:
+            client = openai.OpenAI(api_key="fake-key", base_url=api_base_url, max_retries=0)
+        else:
+            # Load API Key
+            with open(api_key_file, "r") as file:
+                api_key = file.read().strip()
+            client = openai.OpenAI(api_key=api_key, max_retries=0)
+    return client
 
 # System message definition
 system_message = {
@@ -50,21 +69,112 @@ input_files = [
 ]
 output_dir = "path/to/data/processed_data"
 
+# "live" labels through the API now; "export" writes batch job files of unlabeled tweets;
+# "import" merges downloaded batch results (<name>_batch_results*.jsonl in output_dir) into the outputs;
+# "train_local" trains the local first-tier model on local_training_files and prints its routing report
+run_mode = "live"
+bulk_max_requests_per_file = 50000
+
 # Ensure output directory exists
 os.makedirs(output_dir, exist_ok=True)
 
+# Concurrency and rate-limit budget (set these to the account's tier limits)
+max_in_flight = 8
+requests_per_minute = 500
+tokens_per_minute = 30000
+
+# Results journal: labels are appended in batches and fsync'd on a schedule
+journal_flush_every = 50
+journal_fsync_seconds = 5.0
+read_chunksize = 10000
+
+# Model settings (part of the response cache key)
+model_name = "gpt-4o"
+temperature = 0.5
+user_prompt = "Classify the sentiment, topic, and emotion of this tweet: '{tweet}'"
+
+# Response cache shared by all input files and re-runs
+cache_file = os.path.join(output_dir, "gpt_response_cache.sqlite")
+cache_max_bytes = 512 * 1024 * 1024
+cache = ResponseCache(cache_file, cache_max_bytes)
+
+# Local-model-first routing: tweets the local model labels with at least local_confidence_threshold
+# are journaled without a GPT call (None sends everything to GPT). Their journal records get Label_Source "local",
+# GPT labels "gpt", so the outputs say which model labeled each tweet
+local_model_file = os.path.join(output_dir, "local_classifier.pkl")
+local_confidence_threshold = None
+local_training_files = ["path/to/Data/fluoride_posts.csv", "path/to/Data/general_posts.csv"]
+local_report_thresholds = [0.5, 0.6, 0.7, 0.8, 0.9]
+local_model = None  # Loaded by load_local_model() in the modes that route through it
+
+
+def load_local_model():
+    global local_model
+    if local_confidence_threshold is None:
+        return
+    if not os.path.exists(local_model_file):
+        raise FileNotFoundError(f"{local_model_file} not found; run with run_mode = 'train_local' first "
+                                f"or set local_confidence_threshold = None")
+    local_model = LocalClassifier.load(local_model_file)
+
+# Batched prompts: pack up to batch_size tweets (and at most batch_token_budget tweet tokens) into one request.
+# batch_size = 1 sends one tweet per request.
+batch_size = 1
+batch_token_budget = 1500
+batch_user_prompt = ("Classify the sentiment, topic, and emotion of each of these {count} numbered tweets. "
+                     "Respond with exactly one line per tweet, starting with its number, in the format "
+                     "'1. Topic: [Topic1, ...], Sentiment: [Sentiment], Emotion: [Emotion1, ...]'.\n{items}")
+
+
+def tweet_cache_key(tweet):
+    return cache_key(model_name, system_message["content"] + "\n" + user_prompt, temperature, tweet)
+
+
+def batch_cache_key(tweet):
+    # Item lines from a numbered batch answer a different prompt, so they are cached apart from single-tweet answers
+    return cache_key(model_name, system_message["content"] + "\n" + batch_user_prompt, temperature, tweet)
+
+
+def run_cache_key(tweet):
+    """Cache key for the prompt this run sends: the batch prompt when batch_size > 1, else the single-tweet one."""
+    return batch_cache_key(tweet) if batch_size > 1 else tweet_cache_key(tweet)
+
+
+def tweet_messages(tweet):
+    return [system_message, {"role": "user", "content": user_prompt.format(tweet=tweet)}]
+
+
+def parse_response(raw_response):
+    """Extracts Topic, Sentiment, and Emotion from a response line using regex."""
+    topic_match = re.search(r"Topic:\s*\[(.*?)\]", raw_response)
+    sentiment_match = re.search(r"Sentiment:\s*\[(.*?)\]", raw_response)
+    emotion_match = re.search(r"Emotion:\s*\[(.*?)\]", raw_response)
+
+    topic = topic_match.group(1) if topic_match else "Unknown"
+    sentiment = sentiment_match.group(1) if sentiment_match else "Neutral"
+    emotion = emotion_match.group(1) if emotion_match else "None"
+    return topic, sentiment, emotion
 
-def analyze_tweet(tweet):
+
+def analyze_tweet(tweet, use_cache=True, batch_key=None):
     """
     Sends a single tweet to OpenAI for topic, sentiment, and emotion analysis.
     Returns the topic, sentiment, and emotion as text.
+    Responses are served from / stored in the response cache; batch_key also stores the response under
+    that key (a batch item retried on its own), so batched re-runs find it.
+    Rate-limit errors are re-raised so the classification engine can back off and retry.
     """
+    key = tweet_cache_key(tweet)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return parse_response(cached)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[system_message, {"role": "user",
-                                       "content": f"Classify the sentiment, topic, and emotion of this tweet: '{tweet}'"}],
-            temperature=0.5
+        response = openai_client().chat.completions.create(
+            model=model_name,
+            messages=tweet_messages(tweet),
+            temperature=temperature
         )
 
         raw_response = response.choices[0].message.content.strip()
@@ -75,70 +185,304 @@ def analyze_tweet(tweet):
         if not raw_response:
             return "Unknown", "Neutral", "None"
 
-        # Extract Topic, Sentiment, and Emotion using regex
-        topic_match = re.search(r"Topic:\s*\[(.*?)\]", raw_response)
-        sentiment_match = re.search(r"Sentiment:\s*\[(.*?)\]", raw_response)
-        emotion_match = re.search(r"Emotion:\s*\[(.*?)\]", raw_response)
-
-        topic = topic_match.group(1) if topic_match else "Unknown"
-        sentiment = sentiment_match.group(1) if sentiment_match else "Neutral"
-        emotion = emotion_match.group(1) if emotion_match else "None"
+        cache.put(key, raw_response)
+        if batch_key is not None:
+            cache.put(batch_key, raw_response)
+        topic, sentiment, emotion = parse_response(raw_response)
 
         # PRINT: Show extracted details
         print(f"✅ Extracted -> Topic: {topic} | Sentiment: {sentiment} | Emotion: {emotion}\n")
 
         return topic, sentiment, emotion
 
+    except openai.RateLimitError:
+        raise
     except Exception as e:
         print(f"❌ Error processing tweet: {e}")
         return "Unknown", "Neutral", "None"
 
 
-def process_file(file_path):
-    """Processes tweets one by one, saves after each response, and compiles into a final CSV."""
-    df = pd.read_csv(file_path)
+def batch_prompt(tweets):
+    # Line breaks inside a tweet would look like extra numbered items, so flatten them
+    items = "\n".join(f"{number}. '{' '.join(tweet.split())}'" for number, tweet in enumerate(tweets, 1))
+    return batch_user_prompt.format(count=len(tweets), items=items)
 
-    if "Text_nolink" not in df.columns:
-        raise ValueError(f"Column 'Text_nolink' not found in {file_path}")
 
-    # Initialize missing columns
-    for col in ["Topic", "Sentiment", "Emotion"]:
-        if col not in df.columns:
-            df[col] = None
+def split_batch_response(raw_response, count):
+    """
+    Maps item number -> response line for a numbered batch response.
+    Numbers that are missing, out of range, repeated, or without a Sentiment are left out.
+    """
+    lines = {}
+    repeated = set()
+    for line in raw_response.splitlines():
+        item_match = re.match(r"\s*'?(\d+)[.):]\s*(.*)", line)
+        if not item_match:
+            continue
+        number = int(item_match.group(1))
+        if not 1 <= number <= count:
+            continue
+        if number in lines:
+            repeated.add(number)
+        lines[number] = item_match.group(2)
+    return {number: line for number, line in lines.items()
+            if number not in repeated and re.search(r"Sentiment:\s*\[", line)}
+
+
+def analyze_batch(tweets):
+    """
+    Sends several tweets to OpenAI in one numbered prompt.
+    Returns one (topic, sentiment, emotion) per tweet, in order. Items the response got wrong are
+    retried individually; an item that still fails is returned as None and picked up on the next run.
+    """
+    try:
+        response = openai_client().chat.completions.create(
+            model=model_name,
+            messages=[system_message, {"role": "user", "content": batch_prompt(tweets)}],
+            temperature=temperature
+        )
+        raw_response = (response.choices[0].message.content or "").strip()
+        print(f"🔍 AI Batch Response ({len(tweets)} tweets):\n{raw_response}")
+    except openai.RateLimitError:
+        raise
+    except Exception as e:
+        print(f"❌ Error processing batch: {e}")
+        raw_response = ""
+
+    items = split_batch_response(raw_response, len(tweets))
+    results = []
+    for number, tweet in enumerate(tweets, 1):
+        if number in items:
+            cache.put(batch_cache_key(tweet), items[number])
+            results.append(parse_response(items[number]))
+            continue
+
+        print(f"⚠️ Batch item {number} missing or malformed, retrying it on its own")
+        try:
+            results.append(engine.limited(lambda: analyze_tweet(tweet, use_cache=False,
+                                                                batch_key=batch_cache_key(tweet)),
+                                          estimate_tokens(system_message["content"], tweet)))
+        except Exception as e:
+            print(f"❌ Error retrying batch item {number}: {e}")
+            results.append(None)
+    return results
+
+
+def make_batches(jobs):
+    """Groups (key, text) pairs into engine jobs of up to batch_size tweets within batch_token_budget."""
+    batch = []
+    batch_tokens = 0
+    for key, text in jobs:
+        tokens = estimate_tokens(text, completion_tokens=0)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > batch_token_budget):
+            yield batch_job(batch)
+            batch, batch_tokens = [], 0
+        batch.append((key, text))
+        batch_tokens += tokens
+    if batch:
+        yield batch_job(batch)
+
+
+def batch_job(batch):
+    keys = tuple(key for key, _ in batch)
+    texts = [text for _, text in batch]
+    return keys, texts, estimate_tokens(system_message["content"], *texts, completion_tokens=60 * len(texts))
+
+
+def local_labels(text):
+    """Labels from the local model, or None when it is disabled or below the confidence threshold."""
+    if local_model is None:
+        return None
+    predicted, confidence = local_model.predict([text])
+    return predicted[0] if confidence[0] >= local_confidence_threshold else None
+
+
+def train_local_model():
+    tokens_for = lambda tweet: estimate_tokens(system_message["content"], user_prompt.format(tweet=tweet))
+    train_and_report(local_training_files, local_model_file, local_report_thresholds, tokens_for)
+
+
+def tweet_id_column(file_path):
+    """Returns the tweet ID column name ('Tweet ID' from the collectors, 'Tweet.ID' after R)."""
+    columns = pd.read_csv(file_path, nrows=0).columns
+    for col in ["Tweet.ID", "Tweet ID"]:
+        if col in columns:
+            return col
+    raise ValueError(f"No tweet ID column found in {file_path}")
+
+
+def pending_tweets(file_path, id_column, done_ids):
+    """Streams (tweet ID, text) for rows that still need labels, reading only the needed columns in chunks."""
+    columns = pd.read_csv(file_path, nrows=0).columns
+    usecols = [id_column, "Text_nolink"] + (["Sentiment"] if "Sentiment" in columns else [])
+    for chunk in pd.read_csv(file_path, usecols=usecols, dtype={id_column: str}, chunksize=read_chunksize):
+        for row in chunk.itertuples(index=False):
+            tweet_id, text = row[0], row[1]
+            already_labeled = len(row) > 2 and pd.notna(row[2])
+            # Skip empty rows, already processed tweets, and tweets already in the journal
+            if pd.isna(text) or already_labeled or tweet_id in done_ids:
+                continue
+            yield tweet_id, str(text)
+
+
+def output_path(file_path, suffix):
+    return os.path.join(output_dir, os.path.basename(file_path).replace(".csv", suffix))
+
+
+def check_input(file_path):
+    if "Text_nolink" not in pd.read_csv(file_path, nrows=0).columns:
+        raise ValueError(f"Column 'Text_nolink' not found in {file_path}")
+    return tweet_id_column(file_path)
 
-    output_file = os.path.join(output_dir, os.path.basename(file_path).replace(".csv", "_processed.csv"))
 
-    # Process each tweet one by one
-    for index, row in df.iterrows():
-        if pd.isna(row["Text_nolink"]) or pd.notna(row["Sentiment"]):  # FIX: Only process unprocessed tweets
-            continue  # Skip empty rows and already processed tweets
+def write_processed_csv(file_path, id_column):
+    """Builds the final CSV once by merging the journal back into the frame."""
+    output_file = output_path(file_path, "_processed.csv")
+    df = pd.read_csv(file_path, dtype={id_column: str})
+    df = merge_journal(df, output_path(file_path, "_journal.jsonl"), id_column)
+    df.to_csv(output_file, index=False)
+    return output_file
 
-        tweet_text = str(row["Text_nolink"])
-        print(f"📤 Processing tweet {index + 1}/{len(df)}...")
 
-        topic, sentiment, emotion = analyze_tweet(tweet_text)
+def export_file(file_path):
+    """
+    Writes every unlabeled, uncached tweet as a batch API request (cached tweets are journaled instead).
+    Tweets already in request files whose results have not been imported yet are not written again.
+    """
+    id_column = check_input(file_path)
+    requests_prefix = output_path(file_path, "_batch_requests")
+    submitted = pending_ids(requests_prefix, output_path(file_path, "_batch_results"))
+    if submitted:
+        print(f"⏳ {len(submitted)} tweets from earlier batch job files are still waiting for results; skipping them")
+
+    with ResultsJournal(output_path(file_path, "_journal.jsonl"), journal_flush_every,
+                        journal_fsync_seconds) as journal:
+        done_ids = journal.completed_ids()
+
+        def requests():
+            for tweet_id, text in pending_tweets(file_path, id_column, done_ids):
+                if tweet_id in submitted:
+                    continue
+                cached = cache.get(tweet_cache_key(text))
+                if cached is not None:
+                    journal.append(tweet_id, *parse_response(cached))
+                    continue
+                local = local_labels(text)
+                if local is not None:
+                    journal.append(tweet_id, *local, source="local")
+                    continue
+                yield tweet_id, tweet_messages(text)
+
+        paths = write_request_files(requests(), requests_prefix, model_name, temperature, bulk_max_requests_per_file)
+
+    print(f"📦 Wrote {len(paths)} batch job file(s) for {file_path}: {paths}")
+
+
+def import_file(file_path):
+    """Journals downloaded batch results for one input file and rebuilds its _processed.csv."""
+    id_column = check_input(file_path)
+
+    with ResultsJournal(output_path(file_path, "_journal.jsonl"), journal_flush_every,
+                        journal_fsync_seconds) as journal:
+        imported = 0
+        for results_file in result_files(output_path(file_path, "_batch_results")):
+            for tweet_id, raw_response in read_results(results_file):
+                if raw_response:
+                    journal.append(tweet_id, *parse_response(raw_response))
+                    imported += 1
+
+    output_file = write_processed_csv(file_path, id_column)
+    print(f"✅ Imported {imported} batch results for {file_path}. Final results saved to {output_file}.")
 
-        # Save result immediately
-        df.at[index, "Topic"] = topic
-        df.at[index, "Sentiment"] = sentiment
-        df.at[index, "Emotion"] = emotion
-        df.to_csv(output_file, index=False)  # FIX: Now only saves processed tweets
 
+def process_file(file_path):
+    """Processes tweets concurrently, journals each response, and compiles into a final CSV."""
+    id_column = check_input(file_path)
+    journal_file = output_path(file_path, "_journal.jsonl")
+
+    with ResultsJournal(journal_file, journal_flush_every, journal_fsync_seconds) as journal:
+        done_ids = journal.completed_ids()
+        print(f"📒 {len(done_ids)} tweets already journaled in {journal_file}")
+
+        # Cached tweets are journaled straight away; duplicates of an in-flight tweet wait for its result
+        waiting = {}  # cache key -> tweet IDs sharing one request
+        labeled = 0
+        routed = {"local": 0, "gpt": 0}
+
+        def save_labels(tweet_id, labels, source="gpt"):
+            nonlocal labeled
+            labeled += 1
+            print(f"📥 Labeled tweet {tweet_id} ({labeled} this run)")
+            journal.append(tweet_id, *labels, source=source)
+
+        def uncached_tweets():
+            for tweet_id, text in pending_tweets(file_path, id_column, done_ids):
+                key = run_cache_key(text)
+                if key in waiting:
+                    waiting[key].append(tweet_id)
+                    continue
+                cached = cache.get(key)
+                if cached is not None:
+                    save_labels(tweet_id, parse_response(cached))
+                    continue
+                local = local_labels(text)
+                if local is not None:
+                    routed["local"] += 1
+                    save_labels(tweet_id, local, source="local")
+                    continue
+                routed["gpt"] += 1
+                waiting[key] = [tweet_id]
+                yield key, text
+
+        def save_result(key, result):
+            for tweet_id in waiting.pop(key):
+                save_labels(tweet_id, result)
+
+        def save_batch_result(keys, results):
+            for key, result in zip(keys, results):
+                if result is None:
+                    waiting.pop(key)  # Left unjournaled for the next run
+                    continue
+                save_result(key, result)
+
+        if batch_size > 1:
+            engine.run(make_batches(uncached_tweets()), save_batch_result)
+        else:
+            jobs = ((key, text, estimate_tokens(system_message["content"], text)) for key, text in uncached_tweets())
+            engine.run(jobs, save_result)
+
+    print(f"🗃️ Response cache: {cache.stats()}")
+    if local_model is not None and sum(routed.values()):
+        print(f"🏷️ Local model labeled {routed['local']} tweets, escalated {routed['gpt']} to GPT "
+              f"({routed['gpt'] / sum(routed.values()):.1%} escalation rate)")
+
+    output_file = write_processed_csv(file_path, id_column)
     print(f"✅ Finished processing {file_path}. Final results saved to {output_file}.")
 
 
-# Process each file
-for file in input_files:
-    try:
-        process_file(file)
-    except Exception as e:
-        print(f"❌ Error processing file {file}: {e}")
-
-# Combine all processed files into one final CSV
-combined_output = "path/to/data/final_dataset.csv"
-all_files = [os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith("_processed.csv")]
-
-if all_files:
-    combined_df = pd.concat([pd.read_csv(f) for f in all_files], ignore_index=True)
-    combined_df.to_csv(combined_output, index=False)
-    print(f"✅ All processed tweets compiled into: {combined_output}")
+# The engine only sees cache misses, so it skips the lookup
+classify = analyze_batch if batch_size > 1 else (lambda tweet: analyze_tweet(tweet, use_cache=False))
+engine = ClassificationEngine(classify, max_in_flight, requests_per_minute, tokens_per_minute)
+
+if __name__ == "__main__":
+    # Process each file
+    if run_mode == "train_local":
+        train_local_model()
+    else:
+        if run_mode in ("live", "export"):
+            load_local_model()
+        run_step = {"live": process_file, "export": export_file, "import": import_file}[run_mode]
+        for file in input_files:
+            try:
+                run_step(file)
+            except Exception as e:
+                print(f"❌ Error processing file {file}: {e}")
+
+    # Combine all processed files into one final CSV
+    combined_output = "path/to/data/final_dataset.csv"
+    all_files = [os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.endswith("_processed.csv")]
+
+    if all_files and run_mode in ("live", "import"):
+        combined_df = pd.concat([pd.read_csv(f) for f in all_files], ignore_index=True)
+        combined_df.to_csv(combined_output, index=False)
+        print(f"✅ All processed tweets compiled into: {combined_output}")
@@ -0,0 +1,87 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+"""
+assignment_table.py
+
+One Arrow table of topic assignments per group (<group>/assignments.arrow) instead of a
+full-text assignments_{K}_topics.csv per K:
+1. The document keys and Text_nolink are stored once, plus one small integer column per K ("K4", "K5", ...)
+2. Files are written uncompressed, so reads are memory-mapped and zero-copy
+3. convert_group() migrates an existing <group>/{K}_topics/assignments_{K}_topics.csv tree
+
+Run this file directly to migrate the all_negative, all_neutral and all_positive trees.
+"""
+
+assignments_file = "assignments.arrow"
+
+
+def topic_dtype(K):
+    return pa.int8() if K <= 127 else pa.int16()
+
+
+def write_assignments(path, keys, labels_by_k):
+    """
+    keys: dict of column name -> values for the document keys and text (e.g. Author.ID, Text_nolink).
+    labels_by_k: dict of K -> hard topic labels, aligned with the keys.
+    """
+    columns = {name: pa.array(values) for name, values in keys.items()}
+    for K in sorted(labels_by_k):
+        columns[f"K{K}"] = pa.array(np.asarray(labels_by_k[K]), type=topic_dtype(K))
+    feather.write_feather(pa.table(columns), path, compression="uncompressed")
+
+
+def read_assignments(path, K=None, columns=None):
+    """Memory-maps the table. With K, returns the keys plus that K's labels as 'Assigned_Topic'."""
+    if K is not None:
+        table = feather.read_table(path, memory_map=True)
+        keys = [name for name in table.column_names if not re.fullmatch(r"K\d+", name)]
+        return table.select(keys + [f"K{K}"]).rename_columns(keys + ["Assigned_Topic"])
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def convert_group(group_dir, remove_csv=False):
+    """Builds <group_dir>/assignments.arrow from its per-K assignment CSVs."""
+    keys = None
+    labels_by_k = {}
+    csv_paths = []
+    for name in sorted(os.listdir(group_dir)):
+        match = re.fullmatch(r"(\d+)_topics", name)
+        csv_path = os.path.join(group_dir, name, f"assignments_{match.group(1)}_topics.csv") if match else None
+        if csv_path is None or not os.path.exists(csv_path):
+            continue
+        K = int(match.group(1))
+        df = pd.read_csv(csv_path, dtype={"Author.ID": str}, keep_default_na=False)
+        doc_keys = df.drop(columns=["Assigned_Topic"])
+        if keys is None:
+            keys = doc_keys
+        elif not keys.equals(doc_keys):
+            raise ValueError(f"{csv_path} does not list the same documents as the other K values")
+        labels_by_k[K] = df["Assigned_Topic"].to_numpy()
+        csv_paths.append(csv_path)
+
+    if keys is None:
+        print(f"No assignment CSVs found in {group_dir}")
+        return None
+
+    path = os.path.join(group_dir, assignments_file)
+    write_assignments(path, {col: keys[col].tolist() for col in keys.columns}, labels_by_k)
+    csv_bytes = sum(os.path.getsize(p) for p in csv_paths)
+    print(f"{group_dir}: {len(csv_paths)} CSVs ({csv_bytes / 1e6:.1f} MB) -> {path} "
+          f"({os.path.getsize(path) / 1e6:.1f} MB)")
+    if remove_csv:
+        for csv_path in csv_paths:
+            os.remove(csv_path)
+    return path
+
+
+if __name__ == "__main__":
+    # Existing topic-model trees at the repository root
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    remove_csv = False  # Set to True once the Arrow tables have been checked
+    for group in ["all_negative", "all_neutral", "all_positive"]:
+        convert_group(os.path.join(root, group), remove_csv)
@@ -0,0 +1,119 @@
+import glob
+import json
+import os
+from collections import Counter
+
+"""
+bulk_jobs.py
+
+Offline (batch API) path for the GPT labeling stage:
+1. write_request_files() streams chat-completion requests to JSONL job files, one line per tweet,
+   with a stable custom_id of "tweet-<Tweet ID>"; a Tweet ID is written once (the batch API rejects a file
+   with repeated custom_ids) and new files are numbered after the ones already there
+2. read_results() streams a results JSONL back as (Tweet ID, response text) pairs
+3. pending_ids() lists tweets already in request files whose results have not come back, so a repeated
+   export does not submit them again
+Both sides work line by line, so job files of any size never sit in memory.
+"""
+
+custom_id_prefix = "tweet-"
+
+
+def custom_id(tweet_id):
+    return f"{custom_id_prefix}{tweet_id}"
+
+
+def tweet_id_from_custom_id(value):
+    return value[len(custom_id_prefix):] if value.startswith(custom_id_prefix) else None
+
+
+def request_files(path_prefix):
+    return sorted(glob.glob(f"{path_prefix}_[0-9][0-9][0-9].jsonl"))
+
+
+def write_request_files(requests, path_prefix, model, temperature, max_per_file=50000):
+    """
+    requests: iterable of (tweet_id, messages); repeats of a Tweet ID are skipped.
+    Writes <path_prefix>_001.jsonl, _002.jsonl, ... (continuing after existing files) with at most
+    max_per_file requests each (the batch API's per-file limit). Returns the list of files written.
+    """
+    first = len(request_files(path_prefix))
+    paths = []
+    written = set()
+    file = None
+    count = 0
+    try:
+        for tweet_id, messages in requests:
+            if tweet_id in written:
+                continue
+            written.add(tweet_id)
+            if file is None or count >= max_per_file:
+                if file is not None:
+                    file.close()
+                paths.append(f"{path_prefix}_{first + len(paths) + 1:03d}.jsonl")
+                file = open(paths[-1], "w", encoding="utf-8")
+                count = 0
+            line = {
+                "custom_id": custom_id(tweet_id),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": model, "messages": messages, "temperature": temperature},
+            }
+            file.write(json.dumps(line, ensure_ascii=False) + "\n")
+            count += 1
+    finally:
+        if file is not None:
+            file.close()
+    return paths
+
+
+def read_results(path):
+    """
+    Yields (tweet_id, response_text) from a batch results JSONL.
+    Failed or unparseable lines are reported and skipped, so those tweets are exported again next time.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                tweet_id = tweet_id_from_custom_id(record.get("custom_id", ""))
+                response = record.get("response") or {}
+                if tweet_id is None or record.get("error") or response.get("status_code") != 200:
+                    raise ValueError(record.get("error") or f"status {response.get('status_code')}")
+                content = response["body"]["choices"][0]["message"]["content"]
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"⚠️ Skipping result line {line_number} of {os.path.basename(path)}: {e}")
+                continue
+            yield tweet_id, (content or "").strip()
+
+
+def result_files(path_prefix):
+    """Results files for one input, named <path_prefix>*.jsonl (e.g. downloaded per job file)."""
+    return sorted(glob.glob(f"{path_prefix}*.jsonl"))
+
+
+def custom_id_counts(paths):
+    """How many lines of the given request or results files name each Tweet ID."""
+    counts = Counter()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    tweet_id = tweet_id_from_custom_id(json.loads(line).get("custom_id", ""))
+                except (ValueError, AttributeError):
+                    continue
+                if tweet_id is not None:
+                    counts[tweet_id] += 1
+    return counts
+
+
+def pending_ids(requests_prefix, results_prefix):
+    """
+    Tweet IDs requested more often than they appear in results files (jobs still running or not downloaded).
+    A failed result line counts as an answer, so that tweet is exported again.
+    """
+    requested = custom_id_counts(request_files(requests_prefix))
+    answered = custom_id_counts(result_files(results_prefix))
+    return {tweet_id for tweet_id, count in requested.items() if count > answered[tweet_id]}
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+"""
+classification_engine.py
+
+Concurrent request engine used by 01_sentiment_emotion_analysis.py:
+1. Keeps a fixed number of classification requests in flight on a thread pool
+2. Throttles to a requests-per-minute and tokens-per-minute budget
+3. Retries rate-limited (HTTP 429) requests with exponential backoff and jitter
+Results are handed back on the calling thread, so the caller can update and save
+its DataFrame without any locking.
+"""
+
+
+def estimate_tokens(*texts, completion_tokens=60):
+    """Rough token count for a request (~4 characters per token) plus the expected reply."""
+    return sum(len(t) for t in texts) // 4 + completion_tokens
+
+
+def is_rate_limit_error(error):
+    """True for HTTP 429 errors (openai.RateLimitError and anything else carrying status_code=429)."""
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error):
+    """Reads the Retry-After header of a rate-limit error, if the server sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(fn, max_retries=6, base_delay=1.0, max_delay=60.0):
+    """Calls fn(), retrying on 429s with full-jitter exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            retry_after = retry_after_seconds(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            print(f"⏳ Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """Sliding one-minute window over the number of requests and their estimated tokens."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, window=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.events = deque()  # (timestamp, tokens) for every request in the current window
+        self.tokens_in_window = 0
+        self.lock = threading.Lock()
+
+    def _expire(self, now):
+        while self.events and now - self.events[0][0] >= self.window:
+            _, tokens = self.events.popleft()
+            self.tokens_in_window -= tokens
+
+    def acquire(self, tokens):
+        """Blocks until one more request of the given size fits in the budget."""
+        tokens = min(tokens, self.tokens_per_minute)  # An oversized request still goes through on an empty window
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._expire(now)
+                if (len(self.events) < self.requests_per_minute
+                        and self.tokens_in_window + tokens <= self.tokens_per_minute):
+                    self.events.append((now, tokens))
+                    self.tokens_in_window += tokens
+                    return
+                wait_for = self.window - (now - self.events[0][0])
+            time.sleep(max(wait_for, 0.05))
+
+
+class ClassificationEngine:
+    """Runs classify(text) for many texts concurrently under a shared rate limit."""
+
+    def __init__(self, classify, max_in_flight=8, requests_per_minute=500, tokens_per_minute=30000,
+                 max_retries=6):
+        self.classify = classify
+        self.max_in_flight = max_in_flight
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+
+    def limited(self, fn, tokens):
+        """Calls fn() under the engine's rate limit and 429 backoff (usable from worker threads)."""
+        def attempt():
+            self.limiter.acquire(tokens)
+            return fn()
+        return call_with_backoff(attempt, max_retries=self.max_retries)
+
+    def _call(self, text, tokens):
+        return self.limited(lambda: self.classify(text), tokens)
+
+    def run(self, jobs, on_result):
+        """
+        jobs: iterable of (key, text, estimated_tokens), consumed lazily. text is whatever classify accepts
+        (a single tweet, or a list of tweets for batched prompts).
+        on_result(key, result) is called on this thread as each request finishes.
+        Jobs that still fail after all retries are reported and left out, so they are picked up on the next run.
+        """
+        jobs = iter(jobs)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            while True:
+                while len(in_flight) < self.max_in_flight:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    key, text, tokens = job
+                    in_flight[pool.submit(self._call, text, tokens)] = key
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"❌ Giving up on {key} for this run: {e}")
+                        continue
+                    on_result(key, result)
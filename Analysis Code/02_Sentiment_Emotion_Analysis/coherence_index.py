@@ -0,0 +1,131 @@
+import time
+import numpy as np
+from scipy import sparse
+from gensim import matutils
+from gensim.models import CoherenceModel
+
+"""
+coherence_index.py
+
+Topic coherence from a co-occurrence index that is built once per group and reused for every K.
+1. CooccurrenceIndex counts, for every dictionary word pair, how many sliding windows (or documents)
+   contain both words, as a sparse matrix whose diagonal holds the single-word counts
+2. c_v, c_npmi and u_mass are then scored from lookups of each model's top-N words
+The windowing, smoothing and aggregation follow gensim's CoherenceModel, so the numbers match it
+(see compare_with_gensim).
+"""
+
+EPSILON = 1e-12  # Same smoothing constant as gensim.topic_coherence.direct_confirmation_measure
+
+# Window sizes gensim uses by default; None means whole documents (boolean document counts)
+window_sizes = {"c_v": 110, "c_npmi": 10, "u_mass": None}
+
+
+class CooccurrenceIndex:
+    def __init__(self, counts, num_windows, window_size):
+        self.counts = counts
+        self.num_windows = num_windows
+        self.window_size = window_size
+
+    @classmethod
+    def build(cls, docs, dictionary, window_size):
+        """
+        docs: token lists. Words missing from the dictionary still take up window positions, as in gensim.
+        Documents shorter than the window (including empty ones) count as a single window.
+        """
+        token2id = dictionary.token2id
+        rows, cols = [], []
+        num_windows = 0
+        for doc in docs:
+            ids = [token2id.get(w, -1) for w in doc]
+            for window in window_word_sets(ids, window_size):
+                rows.extend([num_windows] * len(window))
+                cols.extend(window)
+                num_windows += 1
+
+        incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                      shape=(num_windows, len(dictionary)))
+        counts = (incidence.T @ incidence).tocsr()
+        return cls(counts, num_windows, window_size)
+
+    def submatrix(self, ids):
+        ids = np.asarray(ids)
+        return self.counts[ids][:, ids].toarray().astype(np.float64)
+
+
+def window_word_sets(ids, window_size):
+    """
+    Yields the dictionary ids counted for each window of one document (-1 marks words outside the dictionary).
+    Long documents are walked the way gensim's WordOccurrenceAccumulator slides: the word leaving the window
+    is dropped even if another copy of it is still inside, and the entering word is added.
+    """
+    if window_size is None or len(ids) <= window_size:
+        yield {w for w in ids if w >= 0}
+        return
+    window = set(ids[:window_size])
+    for start in range(len(ids) - window_size + 1):
+        if start:
+            window.discard(ids[start - 1])
+            window.add(ids[start + window_size - 1])
+        yield {w for w in window if w >= 0}
+
+
+def top_word_ids(lda, topn=20):
+    """Top-N word ids per topic, ordered the way CoherenceModel orders them."""
+    return [matutils.argsort(topic, topn=topn, reverse=True) for topic in lda.get_topics()]
+
+
+def normalized_log_ratio(counts, num_windows):
+    p = counts / num_windows
+    occurrence = np.diag(p)
+    log_ratio = np.log((p + EPSILON) / np.outer(occurrence, occurrence))
+    return log_ratio / -np.log(p + EPSILON)
+
+
+def topic_u_mass(counts, num_windows):
+    i, j = np.tril_indices(len(counts), -1)  # Each word against every higher-ranked word
+    occurrence = np.diag(counts)
+    return np.mean(np.log((counts[i, j] / num_windows + EPSILON) / (occurrence[j] / num_windows)))
+
+
+def topic_npmi(counts, num_windows):
+    nlr = normalized_log_ratio(counts, num_windows)
+    return nlr[~np.eye(len(nlr), dtype=bool)].mean()
+
+
+def topic_c_v(counts, num_windows):
+    # Each word's NPMI context vector against the topic's summed context vector
+    nlr = normalized_log_ratio(counts, num_windows)
+    topic_vector = nlr.sum(axis=0)
+    sims = nlr @ topic_vector / (np.linalg.norm(nlr, axis=1) * np.linalg.norm(topic_vector))
+    return sims.mean()
+
+
+topic_measures = {"c_v": topic_c_v, "c_npmi": topic_npmi, "u_mass": topic_u_mass}
+
+
+def coherence(index, topics, measure="c_v"):
+    """Mean per-topic coherence of topics (lists of word ids) from an index built with window_sizes[measure]."""
+    if index.window_size != window_sizes[measure]:
+        raise ValueError(f"{measure} needs an index with window_size={window_sizes[measure]}")
+    score = topic_measures[measure]
+    return float(np.mean([score(index.submatrix(ids), index.num_windows) for ids in topics]))
+
+
+def compare_with_gensim(models, docs, dictionary, measures=("c_v", "c_npmi", "u_mass"), topn=20):
+    """Prints both engines' scores and timings for a list of models trained on the same docs (e.g. one K sweep)."""
+    for measure in measures:
+        start = time.perf_counter()
+        reference = [CoherenceModel(model=m, texts=docs, dictionary=dictionary, coherence=measure,
+                                    topn=topn).get_coherence() for m in models]
+        gensim_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = CooccurrenceIndex.build(docs, dictionary, window_sizes[measure])
+        ours = [coherence(index, top_word_ids(m, topn), measure) for m in models]
+        index_seconds = time.perf_counter() - start
+
+        diff = max(abs(a - b) for a, b in zip(reference, ours))
+        print(f"{measure}: max |diff| = {diff:.2e} over {len(models)} models; "
+              f"gensim {gensim_seconds:.1f}s, index {index_seconds:.1f}s "
+              f"({gensim_seconds / index_seconds:.1f}x faster)")
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+fake_chat_server.py
+
+Local stand-in for the OpenAI chat-completions endpoint, used to test
+01_sentiment_emotion_analysis.py without spending API credits:
+1. Answers POST /v1/chat/completions with a fixed, correctly formatted label line
+2. Simulates round-trip latency
+3. Returns HTTP 429 on every Nth request to exercise the backoff path
+Point the analysis script at it with api_base_url = "http://127.0.0.1:8000/v1".
+"""
+
+# Server settings
+host = "127.0.0.1"
+port = 8000
+latency_seconds = 0.2
+rate_limit_every = 0  # 0 disables simulated 429s
+canned_response = "Topic: [Fluoride, Health], Sentiment: [Negative], Emotion: [Fear, Disgust, Cynicism]"
+
+
+def make_handler(reply, latency, limit_every):
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class ChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:
+                counter["requests"] += 1
+                request_number = counter["requests"]
+
+            if limit_every and request_number % limit_every == 0:
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           {"retry-after": "1"})
+                return
+
+            time.sleep(latency)
+            content = reply(body) if callable(reply) else reply
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            completion_tokens = len(content) // 4
+            self._send(200, {
+                "id": f"chatcmpl-fake-{request_number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _send(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet
+
+    return ChatHandler
+
+
+def start_fake_server(reply=canned_response, latency=latency_seconds, limit_every=rate_limit_every,
+                      server_host=host, server_port=port):
+    """Starts the fake server on a background thread and returns it (call .shutdown() when done).
+    reply may be a string or a function of the request body."""
+    server = ThreadingHTTPServer((server_host, server_port), make_handler(reply, latency, limit_every))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((host, port), make_handler(canned_response, latency_seconds, rate_limit_every))
+    print(f"Fake chat-completions server listening on http://{host}:{port}/v1")
+    server.serve_forever()
@@ -1,20 +1,29 @@
 import os
+import pickle
+import tempfile
+import numpy as np
 import pandas as pd
 import spacy
-from gensim import corpora, models, utils
-from gensim.models import CoherenceModel
+from gensim import corpora, models
 from gensim.models.phrases import Phrases, Phraser
-import pyLDAvis.gensim
-import pyLDAvis
-from wordcloud import WordCloud
+from scipy import sparse
 import warnings
 from gensim.parsing.preprocessing import STOPWORDS as GENSIM_STOPWORDS
 from collections import Counter
 import re
+from token_store import TokenStore, config_hash
+from vocab_stats import VocabStats
+from assignment_table import write_assignments, assignments_file
+from coherence_index import CooccurrenceIndex, coherence, top_word_ids, window_sizes
+from topic_artifacts import save_vis_inputs, topic_terms_path, vis_inputs_file, render_all
+from model_registry import new_version, save_model
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+keep_pos = {"NOUN","ADJ","VERB"}
+clean_pattern = r"[^a-zA-Z\s]"
 
 custom_sw_path = r"path/to/google-10000-english.txt"
 with open(custom_sw_path, encoding="utf-8") as f:
@@ -23,14 +32,42 @@ custom_stop = set(google_words[:1000])
 custom_stop.update({"fluoride","fluoridated","fluoridation","water"})
 base_stopset = GENSIM_STOPWORDS.union(custom_stop)
 
+# Topic counts swept for every group, and worker processes for the (group, K) grid (1 = serial)
+k_values = range(4,11)
+n_workers = max(1, (os.cpu_count() or 2) - 1)
+
+# Stored in vocab_stats.json next to the counts they are applied to
+vocab_settings = {"top_n_stopwords":10, "no_below":2, "no_above":0.2}
+
+# Document-topic matrices for K at or above this are saved sparse (theta_{K}_topics.npz) instead of dense (.npy)
+sparse_theta_min_k = 50
+
+# Scored from a co-occurrence index built once per group (coherence_index.py); matches gensim's CoherenceModel
+coherence_measure = "c_v"
+
+# "full" renders word clouds and pyLDAvis pages after the sweep (topic_artifacts.py); "metrics_only" skips them
+sweep_mode = "full"
+
 def clean_text(text):
-    return re.sub(r"[^a-zA-Z\s]", "", str(text))
+    return re.sub(clean_pattern, "", str(text))
+
+def doc_tokens(doc):
+    return [token.lemma_.lower() for token in doc
+            if token.pos_ in keep_pos and not token.is_stop]
 
 def spacy_tokenize(text):
     text = clean_text(text)
     doc = nlp(text)
-    return [token.lemma_.lower() for token in doc
-            if token.pos_ in {"NOUN","ADJ","VERB"} and not token.is_stop]
+    return doc_tokens(doc)
+
+def spacy_tokenize_many(texts, batch_size=1000):
+    return [doc_tokens(doc) for doc in nlp.pipe((clean_text(t) for t in texts), batch_size=batch_size)]
+
+def tokenizer_config_hash():
+    # Anything that changes spacy_tokenize output belongs here
+    return config_hash({"spacy": spacy.__version__, "model": nlp.meta["name"],
+                        "model_version": nlp.meta["version"], "pipeline": nlp.pipe_names,
+                        "pos": sorted(keep_pos), "clean": clean_pattern})
 
 def build_bigrams(docs):
     phrases = Phrases(docs, min_count=20, threshold=100)
@@ -44,13 +81,28 @@ def user_labels(df):
         lambda x: "Positive" if x>0.5 else "Negative" if x< -0.5 else "Neutral"
     )
 
-def prepare_docs(texts, stopset, bigram):
-    docs = [spacy_tokenize(t) for t in texts if pd.notnull(t)]
+def prepare_docs(token_docs, stopset, bigram):
+    docs = list(token_docs)
     docs = [bigram[doc] for doc in docs]
     docs = [[w for w in doc if w not in stopset] for doc in docs]
     return docs
 
-def eval_lda(dict_, corpus, docs, out, K, author_ids, texts):
+def document_topic_matrix(lda, corpus, chunksize=2000):
+    # Rows are the normalized gamma that get_document_topics returns, without its per-document calls
+    theta = np.empty((len(corpus), lda.num_topics), dtype=np.float32)
+    for start in range(0, len(corpus), chunksize):
+        gamma, _ = lda.inference(corpus[start:start+chunksize])
+        theta[start:start+len(gamma)] = gamma / gamma.sum(axis=1, keepdims=True)
+    return theta
+
+def save_theta(theta, out, K, minimum_probability=0.01):
+    if K >= sparse_theta_min_k:
+        kept = sparse.csr_matrix(np.where(theta >= minimum_probability, theta, 0))
+        sparse.save_npz(os.path.join(out, f"theta_{K}_topics.npz"), kept)
+    else:
+        np.save(os.path.join(out, f"theta_{K}_topics.npy"), theta)
+
+def eval_lda(dict_, corpus, index, out, K, model_dir=None):
     os.makedirs(out, exist_ok=True)
     print(f"Training LDA with {K} topics for output {out}...")
 
@@ -58,64 +110,136 @@ def eval_lda(dict_, corpus, docs, out, K, author_ids, texts):
                           num_topics=K, random_state=42,
                           passes=10, iterations=200,
                           alpha="auto", eta="auto")
+    if model_dir is not None:
+        save_model(lda, model_dir, K)
+
+    theta = document_topic_matrix(lda, corpus)
+    save_theta(theta, out, K, lda.minimum_probability)
+    labels = theta.argmax(axis=1)
+    # Word clouds and pyLDAvis are rendered later from the saved topic-term matrix and theta
+    np.save(topic_terms_path(out, K), lda.get_topics())
 
-    vis = pyLDAvis.gensim.prepare(lda, corpus, dict_)
-    vis_file = os.path.join(out, f"ldavis_{K}_topics.html")
-    pyLDAvis.save_html(vis, vis_file)
-
-    labels = [max(lda.get_document_topics(b), key=lambda x: x[1])[0] for b in corpus]
-    df_labels = pd.DataFrame({
-        "Author.ID": author_ids,
-        "Text_nolink": texts,
-        "Assigned_Topic": labels
-    })
-    df_labels.to_csv(os.path.join(out, f"assignments_{K}_topics.csv"), index=False)
-
-    for t in range(K):
-        freqs = dict(lda.show_topic(t, topn=50))
-        wc = WordCloud(width=800, height=400, background_color="white")
-        wc.generate_from_frequencies(freqs)
-        wc.to_file(os.path.join(out, f"wordcloud_topic{t}_K{K}.png"))
-
-    coh = CoherenceModel(model=lda, texts=docs, dictionary=dict_, coherence="c_v").get_coherence()
+    coh = coherence(index, top_word_ids(lda), coherence_measure)
     perp = lda.log_perplexity(corpus)
-    words = sum([[w for w,_ in lda.show_topic(t,topn=10)] for t in range(K)],[])
+    words = [w for t in range(K) for w,_ in lda.show_topic(t,topn=10)]
     div = len(set(words))/len(words)
-    return {"K":K,"Coherence":coh,"Perplexity":perp,"Diversity":div}
+    # Labels go to the group's assignments table, written once all K are done
+    return {"K":K,"Coherence":coh,"Perplexity":perp,"Diversity":div}, labels
+
+def save_group_inputs(path, dict_, corpus, index, model_dir):
+    # Serialized once per group; every K job for the group loads this file
+    with open(path, "wb") as f:
+        pickle.dump({"dictionary":dict_, "corpus":corpus, "index":index, "model_dir":model_dir}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+
+_group_inputs = {}
+
+def load_group_inputs(path):
+    # Workers keep the last group they loaded, since jobs are submitted group by group
+    if path not in _group_inputs:
+        _group_inputs.clear()
+        with open(path, "rb") as f:
+            _group_inputs[path] = pickle.load(f)
+    return _group_inputs[path]
+
+def run_sweep_job(inputs_path, out, K):
+    g = load_group_inputs(inputs_path)
+    # eval_lda seeds every model with random_state=42, so results match the serial sweep
+    return eval_lda(g["dictionary"], g["corpus"], g["index"], out, K, g["model_dir"])
+
+def run_sweep(jobs, res_dir, group_keys):
+    """
+    jobs: list of (group, inputs_path, K); group_keys: group -> document key columns aligned with its corpus.
+    Writes each group's metrics.csv and assignments table as soon as its last K finishes.
+    """
+    remaining = Counter(grp for grp,_,_ in jobs)
+    metrics = {grp:[] for grp in remaining}
+    labels = {grp:{} for grp in remaining}
+
+    def finish(grp, result):
+        m, lab = result
+        metrics[grp].append(m)
+        labels[grp][m["K"]] = lab
+        remaining[grp] -= 1
+        if remaining[grp] == 0:
+            pd.DataFrame(sorted(metrics[grp], key=lambda r: r["K"])).to_csv(
+                os.path.join(res_dir,grp,"metrics.csv"),index=False)
+            write_assignments(os.path.join(res_dir,grp,assignments_file), group_keys[grp], labels[grp])
+            print(f"Saved metrics and assignments for {grp}")
+
+    if n_workers == 1:
+        for grp,path,K in jobs:
+            finish(grp, run_sweep_job(path, os.path.join(res_dir,grp,f"{K}_topics"), K))
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = {pool.submit(run_sweep_job, path, os.path.join(res_dir,grp,f"{K}_topics"), K): grp
+                   for grp,path,K in jobs}
+        for fut in as_completed(futures):
+            finish(futures[fut], fut.result())
 
 def main():
     data_dir = r"path/to/data/processed_data"
     res_dir = r"path/to/topic_models"
-    df_f = pd.read_csv(os.path.join(data_dir,"fluoride.csv"))
-    df_g = pd.read_csv(os.path.join(data_dir,"general.csv"))
+    df_f = pd.read_csv(os.path.join(data_dir,"fluoride.csv"), dtype={"Tweet.ID":str})
+    df_g = pd.read_csv(os.path.join(data_dir,"general.csv"), dtype={"Tweet.ID":str})
     labels = user_labels(df_f)
 
-    all_txt = pd.concat([df_f["Text_nolink"], df_g["Text_nolink"]]).dropna().tolist()
-    all_tok = sum([utils.simple_preprocess(t) for t in all_txt],[])
-    top10 = {w for w,_ in Counter(all_tok).most_common(10)}
-    stopset = base_stopset.union(top10)
-
-    for name,df in [("fluoride",df_f),("general",df_g)]:
-        for sent in ["Positive","Neutral","Negative"]:
-            grp = f"{name}_{sent.lower()}"
-            print(f"\nProcessing group: {grp}")
-            auth = labels[labels==sent].index
-            subset = df[df["Author.ID"].isin(auth)]
-            if subset.empty: continue
-            txts = subset["Text_nolink"].tolist()
-            init = [spacy_tokenize(t) for t in txts]
-            bigram = build_bigrams(init)
-            docs = prepare_docs(txts, stopset, bigram)
-            dct = corpora.Dictionary(docs)
-            dct.filter_extremes(no_below=2,no_above=0.2)
-            corp = [dct.doc2bow(doc) for doc in docs]
-            metrics=[]
-            for K in range(4,11):
-                out = os.path.join(res_dir,grp,f"{K}_topics")
-                m = eval_lda(dct,corp,docs,out,K,subset["Author.ID"].tolist(),txts)
-                metrics.append(m)
-            pd.DataFrame(metrics).to_csv(os.path.join(res_dir,grp,"metrics.csv"),index=False)
-            print(f"Saved metrics for {grp}")
+    # Tokenize each dataset once; every group and K reads from the token store
+    os.makedirs(res_dir, exist_ok=True)
+    store = TokenStore(os.path.join(res_dir,"token_store.sqlite"), tokenizer_config_hash())
+    for df in (df_f, df_g):
+        # map(str) turns a missing text into "nan" as str(text) always did (astype(str) keeps NaN under pandas 3);
+        # those rows are tokenized like any other and dropped from the documents by the notnull() filter below
+        df["Tokens"] = store.tokens_for(df["Tweet.ID"].tolist(),
+                                        df["Text_nolink"].map(str).tolist(), spacy_tokenize_many)
+    store.close()
+
+    # One linear pass over both datasets; the saved stats drive the stopwords and filter_extremes
+    all_txt = (t for col in (df_f["Text_nolink"], df_g["Text_nolink"]) for t in col.dropna())
+    stats = VocabStats.build(all_txt, vocab_settings, n_workers=n_workers)
+    stats.save(os.path.join(res_dir,"vocab_stats.json"))
+    stopset = base_stopset.union(stats.top_terms())
+
+    # Per-group sweep inputs are scratch files for the workers; they live in a temporary folder under res_dir
+    # (same disk as the results) that is removed once the sweep finishes or fails
+    with tempfile.TemporaryDirectory(prefix="sweep_inputs_", dir=res_dir) as scratch_dir:
+        jobs = []
+        group_keys = {}
+        for name,df in [("fluoride",df_f),("general",df_g)]:
+            for sent in ["Positive","Neutral","Negative"]:
+                grp = f"{name}_{sent.lower()}"
+                print(f"\nPreparing group: {grp}")
+                auth = labels[labels==sent].index
+                subset = df[df["Author.ID"].isin(auth)]
+                if subset.empty: continue
+                init = subset["Tokens"].tolist()
+                bigram = build_bigrams(init)
+                # Only rows with text become documents, so the keys are taken from the same rows
+                kept = subset[subset["Text_nolink"].notnull()]
+                docs = prepare_docs(kept["Tokens"], stopset, bigram)
+                group_keys[grp] = {"Tweet.ID":kept["Tweet.ID"].tolist(), "Author.ID":kept["Author.ID"].astype(str).tolist(),
+                                   "Text_nolink":kept["Text_nolink"].tolist()}
+                dct = corpora.Dictionary(docs)
+                dct.filter_extremes(**stats.filter_extremes_kwargs())
+                corp = [dct.doc2bow(doc) for doc in docs]
+                # Word co-occurrence counts are the same for every K, so coherence reuses one index per group
+                index = CooccurrenceIndex.build(docs, dct, window_sizes[coherence_measure])
+                os.makedirs(os.path.join(res_dir,grp), exist_ok=True)
+                inputs_path = os.path.join(scratch_dir,f"{grp}.pkl")
+                # Models are kept in the registry (model_registry.py) for scoring new tweets later
+                model_dir = new_version(res_dir,grp,dct,bigram,stopset,
+                                        {"k_values":list(k_values),"tokenizer":tokenizer_config_hash(),
+                                         "vocab_settings":vocab_settings,"n_docs":len(docs)})
+                save_group_inputs(inputs_path,dct,corp,index,model_dir)
+                save_vis_inputs(os.path.join(res_dir,grp,vis_inputs_file),dct,corp)
+                jobs += [(grp,inputs_path,K) for K in k_values]
+
+        print(f"\nTraining {len(jobs)} models on {n_workers} worker(s)...")
+        run_sweep(jobs, res_dir, group_keys)
+
+    if sweep_mode == "full":
+        render_all(res_dir, groups=list(group_keys), n_workers=n_workers)
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
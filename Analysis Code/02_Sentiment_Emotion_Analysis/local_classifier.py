@@ -0,0 +1,183 @@
+import pickle
+from collections import Counter
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import minimize
+from scipy.special import expit, log_softmax, logsumexp
+from gensim import utils
+
+"""
+local_classifier.py
+
+Cheap first tier for the GPT labeling in 01_sentiment_emotion_analysis.py:
+1. TF-IDF over unigrams and bigrams, with linear heads trained on the labels GPT already produced
+   (Data/*.csv): softmax for Sentiment, one-vs-rest logistic for the multi-label Topic and Emotion
+2. predict() returns GPT-style label strings plus a confidence: the lowest of the Sentiment probability
+   and the top Topic and Emotion probabilities. Rows below the confidence threshold are escalated to GPT
+3. routing_report() measures escalation rate and agreement with the GPT labels on a held-out split
+"""
+
+label_fields = ["Topic", "Sentiment", "Emotion"]
+
+
+def split_labels(value):
+    return [part.strip() for part in str(value).split(",") if part.strip()] if pd.notna(value) else []
+
+
+def tokenize(text):
+    tokens = utils.simple_preprocess(str(text))
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def fit_linear(X, Y, l2, softmax, max_iter=300):
+    """Weights (V x L) and biases (L) minimizing softmax or per-column logistic loss plus an L2 penalty."""
+    n, V = X.shape
+    L = Y.shape[1]
+
+    def loss_and_grad(w):
+        W, b = w[:V * L].reshape(V, L), w[V * L:]
+        Z = np.asarray(X @ W) + b
+        if softmax:
+            log_p = log_softmax(Z, axis=1)
+            loss = -(Y * log_p).sum() / n
+            P = np.exp(log_p)
+        else:
+            loss = (np.logaddexp(0, Z) - Y * Z).sum() / n
+            P = expit(Z)
+        G = (P - Y) / n
+        loss += 0.5 * l2 * (W ** 2).sum()
+        grad_W = np.asarray(X.T @ G) + l2 * W
+        return loss, np.concatenate([grad_W.ravel(), G.sum(axis=0)])
+
+    result = minimize(loss_and_grad, np.zeros(V * L + L), jac=True, method="L-BFGS-B",
+                      options={"maxiter": max_iter})
+    return result.x[:V * L].reshape(V, L), result.x[V * L:]
+
+
+class LocalClassifier:
+    def __init__(self, vocab, idf, heads):
+        self.vocab = vocab
+        self.idf = idf
+        self.heads = heads  # field -> (classes, W, b)
+
+    @classmethod
+    def fit(cls, texts, labels, min_df=2, min_label_count=20, l2=1e-4):
+        """texts: list of tweets; labels: DataFrame with GPT-format Topic, Sentiment and Emotion columns."""
+        token_docs = [tokenize(t) for t in texts]
+        doc_freq = Counter(w for doc in token_docs for w in set(doc))
+        vocab = {w: i for i, w in enumerate(sorted(w for w, c in doc_freq.items() if c >= min_df))}
+        idf = np.log((1 + len(texts)) / (1 + np.array([doc_freq[w] for w in vocab]))) + 1
+        model = cls(vocab, idf, {})
+        X = model._vectorize(token_docs)
+
+        heads = {}
+        for field in label_fields:
+            label_lists = [split_labels(v) for v in labels[field]]
+            counts = Counter(label for tags in label_lists for label in tags)
+            classes = sorted(label for label, c in counts.items() if c >= min_label_count)
+            index = {label: j for j, label in enumerate(classes)}
+            Y = np.zeros((len(texts), len(classes)))
+            for i, tags in enumerate(label_lists):
+                for label in tags:
+                    if label in index:
+                        Y[i, index[label]] = 1
+            softmax = field == "Sentiment"
+            keep = Y.sum(axis=1) > 0 if softmax else np.ones(len(texts), dtype=bool)
+            W, b = fit_linear(X[keep], Y[keep], l2, softmax)
+            heads[field] = (classes, W, b)
+        model.heads = heads
+        return model
+
+    def _vectorize(self, token_docs):
+        rows, cols, vals = [], [], []
+        for i, doc in enumerate(token_docs):
+            counts = Counter(self.vocab[w] for w in doc if w in self.vocab)
+            rows += [i] * len(counts)
+            cols += list(counts)
+            vals += [1 + np.log(c) for c in counts.values()]  # Sublinear term frequency
+        X = sparse.csr_matrix((vals, (rows, cols)), shape=(len(token_docs), len(self.vocab)))
+        X = X @ sparse.diags(self.idf)
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms) @ X
+
+    def predict(self, texts):
+        """Returns ([(topic, sentiment, emotion) strings], confidences) for a list of texts."""
+        X = self._vectorize([tokenize(t) for t in texts])
+        fields = {}
+        confidence = np.ones(len(texts))
+        for field, (classes, W, b) in self.heads.items():
+            Z = np.asarray(X @ W) + b
+            if field == "Sentiment":
+                P = np.exp(Z - logsumexp(Z, axis=1, keepdims=True))
+                fields[field] = [classes[j] for j in P.argmax(axis=1)]
+            else:
+                # Every label above 0.5, or the single most likely one if none is
+                P = expit(Z)
+                fields[field] = [", ".join(classes[j] for j in (np.flatnonzero(p >= 0.5) if p.max() >= 0.5
+                                                                else [p.argmax()])) for p in P]
+            confidence = np.minimum(confidence, P.max(axis=1))
+        return list(zip(fields["Topic"], fields["Sentiment"], fields["Emotion"])), confidence
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def jaccard(a, b):
+    a, b = set(split_labels(a)), set(split_labels(b))
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def agreement(predicted, labels):
+    """Sentiment accuracy and mean Topic/Emotion Jaccard of predicted label tuples against GPT labels."""
+    if not predicted:
+        return {"Sentiment": np.nan, "Topic": np.nan, "Emotion": np.nan}
+    return {"Sentiment": np.mean([p[1] == s for p, s in zip(predicted, labels["Sentiment"])]),
+            "Topic": np.mean([jaccard(p[0], t) for p, t in zip(predicted, labels["Topic"])]),
+            "Emotion": np.mean([jaccard(p[2], e) for p, e in zip(predicted, labels["Emotion"])])}
+
+
+def routing_report(model, texts, labels, thresholds, tokens_for):
+    """
+    One row per confidence threshold: escalation rate, agreement of the locally labeled rows with GPT,
+    and the GPT calls and tokens (tokens_for(text) per request) saved per 10k tweets.
+    """
+    predicted, confidence = model.predict(texts)
+    tokens = np.array([tokens_for(t) for t in texts])
+    rows = []
+    for threshold in thresholds:
+        local = confidence >= threshold
+        kept = [p for p, keep in zip(predicted, local) if keep]
+        scores = agreement(kept, labels[local])
+        rows.append({"Threshold": threshold, "Escalation rate": 1 - local.mean(),
+                     "Local Sentiment agreement": scores["Sentiment"], "Local Topic Jaccard": scores["Topic"],
+                     "Local Emotion Jaccard": scores["Emotion"],
+                     "Calls saved per 10k": round(10000 * local.mean()),
+                     "Tokens saved per 10k": round(10000 * tokens[local].sum() / len(texts))})
+    return pd.DataFrame(rows)
+
+
+def train_and_report(data_files, model_path, thresholds, tokens_for, test_fraction=0.2, seed=42):
+    """Trains on a random split of the labeled data files, saves the model and prints the held-out report."""
+    df = pd.concat([pd.read_csv(f, usecols=["Text_nolink"] + label_fields) for f in data_files], ignore_index=True)
+    df = df.dropna(subset=["Text_nolink", "Sentiment"]).reset_index(drop=True)
+    test = np.random.default_rng(seed).random(len(df)) < test_fraction
+    train_df, test_df = df[~test], df[test].reset_index(drop=True)
+
+    model = LocalClassifier.fit(train_df["Text_nolink"].tolist(), train_df)
+    model.save(model_path)
+    predicted, _ = model.predict(test_df["Text_nolink"].tolist())
+    overall = agreement(predicted, test_df)
+    print(f"Local model trained on {len(train_df)} tweets, held out {len(test_df)} -> {model_path}")
+    print(f"Held-out agreement with GPT, all rows: Sentiment {overall['Sentiment']:.3f}, "
+          f"Topic Jaccard {overall['Topic']:.3f}, Emotion Jaccard {overall['Emotion']:.3f}")
+    report = routing_report(model, test_df["Text_nolink"].tolist(), test_df, thresholds, tokens_for)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return model, report
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import time
+from gensim import corpora
+from gensim.models import LdaModel
+from gensim.models.phrases import Phraser
+
+"""
+model_registry.py
+
+Versioned store of the topic models trained by lda_by_sentiment.py, under <res_dir>/registry:
+    <group>/v001/dictionary.dict, phraser.pkl, meta.json   (shared by every K of one sweep)
+    <group>/v001/K4/lda.model, K5/lda.model, ...
+1. Every sweep writes a new version per group, so earlier models stay loadable
+2. The K x V arrays go to separate .npy files: LdaModel.save writes expElogbeta that way, and save_model
+   re-saves the state with sstats split out (gensim would pickle it inside lda.model.state below 10 MB).
+   RegisteredModel.load(..., mmap="r") maps both read-only, so worker processes share one copy of each
+"""
+
+registry_dir_name = "registry"
+
+
+def group_dir(res_dir, group):
+    return os.path.join(res_dir, registry_dir_name, group)
+
+
+def versions(res_dir, group):
+    path = group_dir(res_dir, group)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(m.group(1)) for m in (re.fullmatch(r"v(\d+)", n) for n in os.listdir(path)) if m)
+
+
+def version_dir(res_dir, group, version=None):
+    """Folder of one version (the latest when version is None)."""
+    if version is None:
+        found = versions(res_dir, group)
+        if not found:
+            raise FileNotFoundError(f"No registered models for {group} in {group_dir(res_dir, group)}")
+        version = found[-1]
+    return os.path.join(group_dir(res_dir, group), f"v{version:03d}")
+
+
+def new_version(res_dir, group, dictionary, phraser, stopwords, meta):
+    """Saves the group's preprocessing under the next version number and returns its folder."""
+    found = versions(res_dir, group)
+    path = os.path.join(group_dir(res_dir, group), f"v{(found[-1] if found else 0) + 1:03d}")
+    os.makedirs(path)
+    dictionary.save(os.path.join(path, "dictionary.dict"))
+    phraser.save(os.path.join(path, "phraser.pkl"))
+    meta = dict(meta, group=group, created=time.strftime("%Y-%m-%d %H:%M:%S"), stopwords=sorted(stopwords))
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return path
+
+
+def model_path(path, K):
+    return os.path.join(path, f"K{K}", "lda.model")
+
+
+def save_model(lda, path, K):
+    os.makedirs(os.path.dirname(model_path(path, K)), exist_ok=True)
+    lda.save(model_path(path, K))
+    # LdaModel.save pickles the state whole unless sstats is large; store it as lda.model.state.sstats.npy
+    lda.state.save(model_path(path, K) + ".state", separately=["sstats"])
+
+
+class RegisteredModel:
+    """One registered (group, version, K): the LDA model plus the preprocessing it was trained with."""
+
+    def __init__(self, lda, dictionary, phraser, meta):
+        self.lda = lda
+        self.dictionary = dictionary
+        self.phraser = phraser
+        self.meta = meta
+        self.stopwords = set(meta["stopwords"])
+
+    @classmethod
+    def load(cls, path, K, mmap="r"):
+        lda = LdaModel.load(model_path(path, K), mmap=mmap)
+        dictionary = corpora.Dictionary.load(os.path.join(path, "dictionary.dict"))
+        phraser = Phraser.load(os.path.join(path, "phraser.pkl"))
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(lda, dictionary, phraser, meta)
+
+    def docs(self, token_docs):
+        """Lemma lists with the same bigrams and stopwords as training."""
+        return [[w for w in self.phraser[doc] if w not in self.stopwords] for doc in token_docs]
+
+    def bows(self, token_docs):
+        return [self.dictionary.doc2bow(doc) for doc in self.docs(token_docs)]
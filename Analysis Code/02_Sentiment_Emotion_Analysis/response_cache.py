@@ -0,0 +1,95 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+"""
+response_cache.py
+
+Persistent, content-addressed cache of raw GPT responses.
+1. Keys are a SHA-256 of the model name, prompt text, temperature and normalized tweet text,
+   so duplicate tweets (and re-runs with the same prompt) never hit the API twice
+2. Entries live in a single SQLite file and are evicted least-recently-used once the
+   stored responses exceed a size limit
+3. Hit/miss counters are kept for the current run
+"""
+
+
+def normalize_tweet(text):
+    """Unicode-normalizes, case-folds and collapses whitespace so near-identical copies share a key."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model, prompt, temperature, text):
+    payload = json.dumps([model, prompt, temperature, normalize_tweet(text)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of raw responses, safe to share between worker threads."""
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                 key TEXT PRIMARY KEY,
+                                 response TEXT NOT NULL,
+                                 size INTEGER NOT NULL,
+                                 last_used REAL NOT NULL)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached response, or None on a miss."""
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                              (key, response, size, time.time()))
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drops least recently used entries until the cache is back under 90% of max_bytes."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY last_used")
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries, "bytes": self.total_bytes}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+
+"""
+results_journal.py
+
+Append-only JSONL journal of GPT labels, keyed by tweet ID.
+1. Labels are buffered and written in batches, with an fsync on a fixed schedule
+2. Restarting reads only the journal to find which tweets are already labeled
+3. merge_journal() folds the journal back into the input frame once, at the end of a run
+4. Every record carries a Label_Source ("gpt" or "local") saying which model produced its labels;
+   records written before the field existed merge with an empty Label_Source
+A torn last line (from a crash mid-write) is ignored when reading and trimmed before appending.
+"""
+
+label_columns = ["Topic", "Sentiment", "Emotion", "Label_Source"]
+
+
+def read_journal(path):
+    """Yields journal records in write order, skipping a torn or unreadable line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                break  # Partially written last record
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def merge_journal(df, path, id_column):
+    """Copies journaled labels into df (matched on id_column); the latest record for an ID wins."""
+    latest = {record["id"]: record for record in read_journal(path)}
+    if not latest:
+        return df
+
+    ids = df[id_column].astype(str)
+    for col in label_columns:
+        if col not in df.columns:
+            df[col] = None
+        journaled = ids.map({tweet_id: record.get(col) for tweet_id, record in latest.items()})
+        df[col] = journaled.where(ids.isin(list(latest)), df[col])
+    return df
+
+
+def _trim_torn_tail(path):
+    """Cuts a partially written last line so new records start on a fresh line."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data.endswith(b"\n"):
+            return
+        file.truncate(data.rfind(b"\n") + 1)
+
+
+class ResultsJournal:
+    """Buffered, append-only writer for one _journal.jsonl file."""
+
+    def __init__(self, path, flush_every=50, fsync_seconds=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.fsync_seconds = fsync_seconds
+        self.buffer = []
+        _trim_torn_tail(path)
+        self.file = open(path, "a", encoding="utf-8")
+        self.last_fsync = time.monotonic()
+
+    def completed_ids(self):
+        """IDs of every tweet already in the journal."""
+        return {record["id"] for record in read_journal(self.path)}
+
+    def append(self, tweet_id, topic, sentiment, emotion, source="gpt"):
+        self.buffer.append(json.dumps({"id": str(tweet_id), "Topic": topic, "Sentiment": sentiment,
+                                       "Emotion": emotion, "Label_Source": source}, ensure_ascii=False) + "\n")
+        fsync_due = time.monotonic() - self.last_fsync >= self.fsync_seconds
+        if len(self.buffer) >= self.flush_every or fsync_due:
+            self.flush(sync=fsync_due)
+
+    def flush(self, sync=False):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer = []
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush(sync=True)
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,94 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from model_registry import RegisteredModel, version_dir
+from lda_by_sentiment import spacy_tokenize_many, tokenizer_config_hash, document_topic_matrix
+
+"""
+score_new_tweets.py
+
+Labels newly pulled tweets with a registered topic model instead of retraining:
+1. The chosen (group, K, version) is loaded once per process, with the topic-word arrays memory-mapped
+   read-only, so worker processes share one copy through the page cache
+2. The input CSV is read in batches of batch_size rows; each batch is tokenized, mapped to the model's
+   dictionary and labeled with one batched inference call
+3. Results (Tweet.ID, Author.ID, Assigned_Topic, Topic_Probability) are appended to the output CSV batch by batch;
+   with worker processes at most 2 x n_workers batches are read ahead, so a large CSV is never queued whole
+4. Inference draws its starting point from the model's random_state, which is reseeded from random_seed and the
+   batch number before every batch, so the labels do not depend on n_workers
+"""
+
+res_dir = r"path/to/topic_models"
+group = "fluoride_negative"
+K = 6
+version = None  # None = latest registered version for the group
+input_csv = r"path/to/new_tweets.csv"
+output_csv = r"path/to/new_tweets_topics.csv"
+batch_size = 5000
+n_workers = 1
+random_seed = 42
+
+_model = None
+
+
+# Function to load the registered model once per process
+def init_worker(path, K):
+    global _model
+    _model = RegisteredModel.load(path, K, mmap="r")
+
+
+# Function to label one (batch number, rows) pair
+def score_batch(numbered_batch):
+    number, batch = numbered_batch
+    texts = batch["Text_nolink"].fillna("").astype(str).tolist()
+    bows = _model.bows(spacy_tokenize_many(texts))
+    _model.lda.random_state = np.random.RandomState(random_seed + number)
+    theta = document_topic_matrix(_model.lda, bows)
+    out = batch[["Tweet.ID", "Author.ID"]].copy()
+    out["Assigned_Topic"] = theta.argmax(axis=1)
+    out["Topic_Probability"] = theta.max(axis=1)
+    return out
+
+
+def write_batches(results, path):
+    rows = 0
+    for i, out in enumerate(results):
+        out.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+        rows += len(out)
+    return rows
+
+
+def scored_in_order(pool, batches):
+    # Keeps at most 2 x n_workers batches in flight and yields their results in input order
+    pending = deque()
+    for batch in batches:
+        if len(pending) >= 2 * n_workers:
+            yield pending.popleft().result()
+        pending.append(pool.submit(score_batch, batch))
+    while pending:
+        yield pending.popleft().result()
+
+
+def score_csv(input_path, output_path, path, K):
+    batches = enumerate(pd.read_csv(input_path, dtype={"Tweet.ID": str, "Author.ID": str}, chunksize=batch_size))
+    if n_workers == 1:
+        init_worker(path, K)
+        return write_batches(map(score_batch, batches), output_path)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(path, K)) as pool:
+        return write_batches(scored_in_order(pool, batches), output_path)
+
+
+if __name__ == "__main__":
+    path = version_dir(res_dir, group, version)
+    init_worker(path, K)
+    if _model.meta["tokenizer"] != tokenizer_config_hash():
+        print(f"⚠️ The tokenizer settings changed since {path} was trained; labels may not match training")
+
+    start = time.perf_counter()
+    rows = score_csv(input_csv, output_csv, path, K)
+    seconds = time.perf_counter() - start
+    print(f"✅ Labeled {rows} tweets with {group} K={K} ({os.path.basename(path)}) in {seconds:.1f}s "
+          f"-> {output_csv}")
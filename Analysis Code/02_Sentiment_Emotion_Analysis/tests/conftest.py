@@ -0,0 +1,51 @@
+import importlib.util
+import os
+import shutil
+import sys
+import pytest
+
+"""
+Shared fixtures for the tests of the 02_Sentiment_Emotion_Analysis scripts.
+The scripts import each other by module name, so their folder goes on sys.path.
+"""
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+data_dir = os.path.join(script_dir, "..", "..", "Data")
+
+
+@pytest.fixture
+def sentiment_script(tmp_path, monkeypatch):
+    """A fresh import of 01_sentiment_emotion_analysis.py whose relative output paths land in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location("sentiment_emotion_analysis",
+                                                  os.path.join(script_dir, "01_sentiment_emotion_analysis.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    module.cache.close()
+
+
+@pytest.fixture
+def fake_server():
+    """fake_chat_server.py on a free port; returns start(**options) -> base URL for the OpenAI client."""
+    from fake_chat_server import start_fake_server
+    servers = []
+
+    def start(**options):
+        servers.append(start_fake_server(server_port=0, **options))
+        return f"http://127.0.0.1:{servers[-1].server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def lda_workdir(tmp_path, monkeypatch):
+    """A working directory where lda_by_sentiment.py finds its stopword list; needs the spaCy model."""
+    pytest.importorskip("en_core_web_sm")
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("path/to", exist_ok=True)
+    shutil.copy(os.path.join(script_dir, "google-10000-english.txt"), "path/to/google-10000-english.txt")
+    return tmp_path
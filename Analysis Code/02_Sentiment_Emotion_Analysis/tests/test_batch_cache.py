@@ -0,0 +1,37 @@
+import os
+import re
+import pandas as pd
+
+label_line = "Topic: [Fluoride], Sentiment: [Negative], Emotion: [Fear]"
+
+
+def batch_reply(requests):
+    """Fake chat reply that answers every numbered item except the ones mentioning 'garbled'."""
+    def reply(body):
+        prompt = body["messages"][-1]["content"]
+        requests.append(prompt)
+        if "numbered tweets" not in prompt:
+            return label_line
+        items = re.findall(r"^(\d+)\. '(.*)'$", prompt, re.MULTILINE)
+        return "\n".join(f"{n}. {label_line}" if "garbled" not in text else f"{n}. ???" for n, text in items)
+    return reply
+
+
+def test_retried_batch_item_is_cached_for_batched_reruns(sentiment_script, fake_server):
+    requests = []
+    sentiment_script.api_base_url = fake_server(reply=batch_reply(requests), latency=0)
+    sentiment_script.batch_size = 3
+    sentiment_script.engine.classify = sentiment_script.analyze_batch
+    pd.DataFrame({"Tweet ID": ["1", "2", "3"],
+                  "Text_nolink": ["fluoride again", "a garbled one", "water works"]}).to_csv("tweets.csv", index=False)
+
+    sentiment_script.process_file("tweets.csv")
+    # One batch, then the malformed item on its own
+    assert len(requests) == 2 and "numbered tweets" not in requests[1]
+
+    # Rerun from scratch: every item, the retried one included, is served from the cache
+    os.remove(sentiment_script.output_path("tweets.csv", "_journal.jsonl"))
+    sentiment_script.process_file("tweets.csv")
+    assert len(requests) == 2
+    processed = pd.read_csv(sentiment_script.output_path("tweets.csv", "_processed.csv"))
+    assert processed["Sentiment"].tolist() == ["Negative"] * 3
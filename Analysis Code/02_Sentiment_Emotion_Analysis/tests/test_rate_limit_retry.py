@@ -0,0 +1,13 @@
+def test_429_goes_through_engine_backoff(sentiment_script, fake_server, capsys):
+    # Every 2nd request is rate limited: the first attempt succeeds, the second tweet's first attempt gets a 429
+    sentiment_script.api_base_url = fake_server(latency=0, limit_every=2)
+    results = {}
+    jobs = [(f"t{i}", f"tweet number {i}", 100) for i in range(2)]
+    sentiment_script.engine.max_in_flight = 1
+    sentiment_script.engine.run(jobs, results.__setitem__)
+
+    assert sorted(results) == ["t0", "t1"]
+    assert sentiment_script.openai_client().max_retries == 0
+    assert "Rate limited, retrying" in capsys.readouterr().out
+    # Both attempts of the limited tweet were counted by the engine's rate limiter
+    assert len(sentiment_script.engine.limiter.events) == 3
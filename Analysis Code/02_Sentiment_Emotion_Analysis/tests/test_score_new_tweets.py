@@ -0,0 +1,38 @@
+import os
+import pandas as pd
+from gensim import corpora, models
+from conftest import data_dir
+
+
+def register_model(res_dir, docs, K):
+    from lda_by_sentiment import base_stopset, build_bigrams, prepare_docs
+    from model_registry import new_version, save_model
+    bigram = build_bigrams(docs)
+    docs = prepare_docs(docs, base_stopset, bigram)
+    dictionary = corpora.Dictionary(docs)
+    lda = models.LdaModel(corpus=[dictionary.doc2bow(doc) for doc in docs], id2word=dictionary,
+                          num_topics=K, random_state=42, passes=2)
+    path = new_version(res_dir, "test_group", dictionary, bigram, base_stopset, {"tokenizer": None})
+    save_model(lda, path, K)
+    return path
+
+
+def test_labels_do_not_depend_on_worker_count(lda_workdir):
+    import score_new_tweets
+    from lda_by_sentiment import spacy_tokenize_many
+    tweets = pd.read_csv(os.path.join(data_dir, "fluoride_posts.csv"), dtype={"Tweet.ID": str, "Author.ID": str},
+                         nrows=1500)
+    tweets.to_csv("new_tweets.csv", index=False)
+    path = register_model("topic_models", spacy_tokenize_many(tweets["Text_nolink"].fillna("").tolist()), K=5)
+
+    score_new_tweets.batch_size = 200
+    scored = {}
+    for n_workers in (1, 2, 3):
+        score_new_tweets.n_workers = n_workers
+        rows = score_new_tweets.score_csv("new_tweets.csv", f"scored_{n_workers}.csv", path, 5)
+        assert rows == len(tweets)
+        scored[n_workers] = pd.read_csv(f"scored_{n_workers}.csv", dtype=str)
+
+    assert scored[1]["Tweet.ID"].tolist() == tweets["Tweet.ID"].tolist()
+    pd.testing.assert_frame_equal(scored[1], scored[2])
+    pd.testing.assert_frame_equal(scored[1], scored[3])
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+from token_store import TokenStore, text_hash
+
+
+def fake_tokenize_many(texts):
+    return [text.lower().split() for text in texts]
+
+
+def test_null_text_row_is_tokenized_as_nan(tmp_path):
+    df = pd.DataFrame({"Tweet.ID": ["1", "2", "3"], "Text_nolink": ["Fluoride Again", None, "Water works"]})
+    store = TokenStore(str(tmp_path / "tokens.sqlite"), "config")
+    # Same conversion as lda_by_sentiment.main()
+    tokens = store.tokens_for(df["Tweet.ID"].tolist(), df["Text_nolink"].map(str).tolist(), fake_tokenize_many)
+    assert tokens == [["fluoride", "again"], ["nan"], ["water", "works"]]
+    # A second pass reads every row, the null one included, back from the store
+    reread = store.tokens_for(df["Tweet.ID"].tolist(), df["Text_nolink"].map(str).tolist(),
+                              lambda texts: pytest.fail(f"re-tokenized {texts}"))
+    assert reread == tokens
+    store.close()
+
+
+def test_text_hash_rejects_non_str():
+    with pytest.raises(TypeError, match="must be str"):
+        text_hash(float("nan"))
@@ -0,0 +1,21 @@
+import os
+import pandas as pd
+from conftest import data_dir
+from vocab_stats import VocabStats
+
+settings = {"top_n_stopwords": 10, "no_below": 2, "no_above": 0.2}
+
+
+def test_parallel_runs_match_serial_stopset():
+    texts = pd.read_csv(os.path.join(data_dir, "general_posts.csv"), usecols=["Text_nolink"])["Text_nolink"]
+    texts = texts.dropna().tolist()
+    serial = VocabStats.build(texts, settings, chunksize=500)
+    # Terms tied on count are ordered by first appearance, so the stopset depends on the merge order
+    top = serial.term_counts.most_common()
+    assert any(top[i][1] == top[i + 1][1] for i in range(len(top) - 1))
+
+    for _ in range(3):
+        parallel = VocabStats.build(texts, settings, chunksize=500, n_workers=3)
+        assert parallel.top_terms(200) == serial.top_terms(200)
+        assert list(parallel.term_counts.items()) == list(serial.term_counts.items())
+        assert parallel.n_docs == serial.n_docs
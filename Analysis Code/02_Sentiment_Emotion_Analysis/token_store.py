@@ -0,0 +1,84 @@
+import hashlib
+import json
+import sqlite3
+
+"""
+token_store.py
+
+Persistent store of POS-filtered lemma lists for lda_by_sentiment.py.
+1. Rows are keyed by Tweet ID plus a hash of the tokenizer configuration, so changing the
+   spaCy model, POS filter or cleaning regex starts a fresh set of entries
+2. Each entry keeps a hash of the text it was built from; new or edited tweets are re-tokenized,
+   everything else is read back without running spaCy
+"""
+
+
+def config_hash(config):
+    """Stable hash of a JSON-serializable tokenizer configuration."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def text_hash(text):
+    if not isinstance(text, str):
+        raise TypeError(f"Token store texts must be str, got {type(text).__name__} ({text!r}); "
+                        f"convert missing texts before calling tokens_for")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenStore:
+    """SQLite-backed token lists for one tokenizer configuration."""
+
+    def __init__(self, path, tokenizer_hash):
+        self.tokenizer_hash = tokenizer_hash
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS tokens (
+                                 tweet_id TEXT NOT NULL,
+                                 config TEXT NOT NULL,
+                                 text_hash TEXT NOT NULL,
+                                 tokens TEXT NOT NULL,
+                                 PRIMARY KEY (tweet_id, config))""")
+        self.conn.commit()
+
+    def _lookup(self, ids, chunk=900):
+        found = {}
+        unique_ids = list(dict.fromkeys(ids))
+        for i in range(0, len(unique_ids), chunk):
+            part = unique_ids[i:i + chunk]
+            rows = self.conn.execute(
+                f"SELECT tweet_id, text_hash, tokens FROM tokens WHERE config = ? "
+                f"AND tweet_id IN ({','.join('?' * len(part))})", [self.tokenizer_hash] + part)
+            for tweet_id, stored_hash, tokens in rows:
+                found[tweet_id] = (stored_hash, tokens)
+        return found
+
+    def tokens_for(self, ids, texts, tokenize_many):
+        """
+        Token lists for each (id, text) pair, in order.
+        Only pairs that are missing or whose text changed go through tokenize_many(list of texts).
+        """
+        ids = [str(i) for i in ids]
+        hashes = [text_hash(t) for t in texts]
+        found = self._lookup(ids)
+
+        result = [None] * len(ids)
+        todo = []
+        for i, (tweet_id, h) in enumerate(zip(ids, hashes)):
+            stored = found.get(tweet_id)
+            if stored is not None and stored[0] == h:
+                result[i] = json.loads(stored[1])
+            else:
+                todo.append(i)
+
+        if todo:
+            print(f"Tokenizing {len(todo)} new or changed texts ({len(ids) - len(todo)} read from the token store)")
+            computed = tokenize_many([texts[i] for i in todo])
+            rows = []
+            for i, tokens in zip(todo, computed):
+                result[i] = tokens
+                rows.append((ids[i], self.tokenizer_hash, hashes[i], json.dumps(tokens)))
+            self.conn.executemany("INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return result
+
+    def close(self):
+        self.conn.close()
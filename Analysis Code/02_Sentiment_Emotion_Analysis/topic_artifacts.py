@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from scipy import sparse
+import pyLDAvis
+from wordcloud import WordCloud
+
+"""
+topic_artifacts.py
+
+Word clouds and pyLDAvis pages for the topic models in lda_by_sentiment.py, rendered as a separate stage.
+1. Training saves what the renderers need: <group>/vis_inputs.npz (vocabulary, term frequencies and document
+   lengths, once per group) and <group>/{K}_topics/topic_terms_{K}_topics.npy next to theta_{K}_topics
+2. render_all() renders every (group, K) in a process pool from those files, without the models
+3. Each output folder keeps artifacts_{K}.json with a hash of its inputs; unchanged folders are skipped
+
+Run this file directly to (re)render an existing results directory.
+"""
+
+vis_inputs_file = "vis_inputs.npz"
+wordcloud_words = 50
+
+
+def topic_terms_path(out, K):
+    return os.path.join(out, f"topic_terms_{K}_topics.npy")
+
+
+def save_vis_inputs(path, dictionary, corpus):
+    """The corpus statistics pyLDAvis.gensim.prepare would extract, in dictionary id order."""
+    term_frequency = np.zeros(len(dictionary))
+    doc_lengths = np.zeros(len(corpus))
+    for d, bow in enumerate(corpus):
+        for term_id, count in bow:
+            term_frequency[term_id] += count
+        doc_lengths[d] = sum(count for _, count in bow)
+    term_frequency[term_frequency == 0] = 0.01  # Same floor pyLDAvis uses for unseen terms
+    vocab = np.array([dictionary[i] for i in range(len(dictionary))], dtype=str)
+    np.savez(path, vocab=vocab, term_frequency=term_frequency, doc_lengths=doc_lengths)
+
+
+def theta_path(out, K):
+    dense = os.path.join(out, f"theta_{K}_topics.npy")
+    return dense if os.path.exists(dense) else os.path.join(out, f"theta_{K}_topics.npz")
+
+
+def load_theta(path):
+    if path.endswith(".npz"):
+        theta = sparse.load_npz(path).toarray()
+        return theta / theta.sum(axis=1, keepdims=True)  # Rows lost their small entries when saved sparse
+    return np.load(path)
+
+
+def file_digest(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def output_files(out, K):
+    return [os.path.join(out, f"ldavis_{K}_topics.html")] + \
+           [os.path.join(out, f"wordcloud_topic{t}_K{K}.png") for t in range(K)]
+
+
+def render_wordclouds(topic_terms, vocab, out, K):
+    for t in range(K):
+        top = np.argsort(topic_terms[t])[::-1][:wordcloud_words]
+        freqs = {vocab[i]: float(topic_terms[t, i]) for i in top}
+        wc = WordCloud(width=800, height=400, background_color="white")
+        wc.generate_from_frequencies(freqs)
+        wc.to_file(os.path.join(out, f"wordcloud_topic{t}_K{K}.png"))
+
+
+def render_ldavis(topic_terms, theta, vis_inputs, out, K):
+    # n_jobs=1: the pool already runs one render per process
+    vis = pyLDAvis.prepare(topic_term_dists=topic_terms, doc_topic_dists=theta,
+                           doc_lengths=vis_inputs["doc_lengths"], vocab=list(vis_inputs["vocab"]),
+                           term_frequency=vis_inputs["term_frequency"], n_jobs=1)
+    pyLDAvis.save_html(vis, os.path.join(out, f"ldavis_{K}_topics.html"))
+
+
+def render_job(group_dir, K, force=False):
+    """Renders one (group, K) folder unless its inputs and outputs are unchanged. Returns True if it rendered."""
+    out = os.path.join(group_dir, f"{K}_topics")
+    inputs = [os.path.join(group_dir, vis_inputs_file), topic_terms_path(out, K), theta_path(out, K)]
+    stamp_path = os.path.join(out, f"artifacts_{K}.json")
+    digest = file_digest(inputs)
+    if not force and os.path.exists(stamp_path) and all(os.path.exists(p) for p in output_files(out, K)):
+        with open(stamp_path, encoding="utf-8") as f:
+            if json.load(f).get("inputs") == digest:
+                return False
+
+    with np.load(inputs[0]) as data:
+        vis_inputs = dict(data)
+    topic_terms = np.load(inputs[1])
+    render_wordclouds(topic_terms, vis_inputs["vocab"], out, K)
+    render_ldavis(topic_terms, load_theta(inputs[2]), vis_inputs, out, K)
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        json.dump({"inputs": digest}, f)
+    return True
+
+
+def find_jobs(res_dir, groups=None):
+    """(group_dir, K) for every output folder that has saved topic-term data."""
+    jobs = []
+    for grp in sorted(groups or os.listdir(res_dir)):
+        group_dir = os.path.join(res_dir, grp)
+        if not os.path.exists(os.path.join(group_dir, vis_inputs_file)):
+            continue
+        for name in sorted(os.listdir(group_dir)):
+            match = re.fullmatch(r"(\d+)_topics", name)
+            if match and os.path.exists(topic_terms_path(os.path.join(group_dir, name), int(match.group(1)))):
+                jobs.append((group_dir, int(match.group(1))))
+    return jobs
+
+
+def render_all(res_dir, groups=None, n_workers=1, force=False):
+    jobs = find_jobs(res_dir, groups)
+    print(f"Rendering artifacts for {len(jobs)} models on {n_workers} worker(s)...")
+    if n_workers == 1:
+        rendered = sum(render_job(group_dir, K, force) for group_dir, K in jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(render_job, group_dir, K, force) for group_dir, K in jobs]
+            rendered = sum(fut.result() for fut in as_completed(futures))
+    print(f"Rendered {rendered}, skipped {len(jobs) - rendered} unchanged")
+
+
+if __name__ == "__main__":
+    res_dir = r"path/to/topic_models"
+    n_workers = max(1, (os.cpu_count() or 2) - 1)
+    force = False  # Set to True to re-render everything, e.g. after changing the word-cloud settings
+    render_all(res_dir, n_workers=n_workers, force=force)
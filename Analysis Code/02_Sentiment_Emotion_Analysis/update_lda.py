@@ -0,0 +1,149 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from gensim import corpora
+from gensim.matutils import dirichlet_expectation
+from scipy.spatial.distance import jensenshannon
+from model_registry import RegisteredModel, version_dir, new_version, save_model
+from assignment_table import write_assignments, read_assignments, assignments_file
+from coherence_index import CooccurrenceIndex, coherence, top_word_ids, window_sizes
+from token_store import TokenStore
+from lda_by_sentiment import spacy_tokenize_many, tokenizer_config_hash, document_topic_matrix, coherence_measure
+
+"""
+update_lda.py
+
+Incremental mode for lda_by_sentiment.py: folds newly pulled tweets into a registered model instead of retraining.
+1. Loads the registered (group, K) model, dictionary, bigrams and stopwords
+2. Keeps only tweets the group has not seen yet (its assignments.arrow plus earlier updates)
+3. Adds new words that reach no_below within the new documents to the dictionary (at most max_new_terms,
+   and never past max_vocab). Existing word ids never change, so the model's topic-word matrix is
+   widened with zero counts instead of being rebuilt
+4. Runs the online update (LdaModel.update) on the new bag-of-words only, so cost follows the new data
+5. Writes <group>/updates/vNNN_K{K}_assignments.arrow and appends to updates/metrics.csv for the new rows only,
+   plus drift_vNNN_K{K}.csv comparing every topic's word distribution before and after
+6. Registers the updated model as a new version
+"""
+
+res_dir = r"path/to/topic_models"
+group = "fluoride_negative"
+K = 6
+version = None  # None = latest registered version for the group
+new_csv = r"path/to/new_tweets.csv"  # Processed tweets (Tweet.ID, Author.ID, Text_nolink) for this group
+
+max_new_terms = 2000
+max_vocab = 50000
+update_passes = 1
+update_chunksize = 2000
+drift_topn = 10
+
+
+# Function to collect the Tweet IDs already assigned for the group
+def seen_tweet_ids(group_path):
+    paths = [os.path.join(group_path, assignments_file)] + \
+            sorted(glob.glob(os.path.join(group_path, "updates", "*_assignments.arrow")))
+    seen = set()
+    for path in paths:
+        if os.path.exists(path):
+            seen.update(read_assignments(path, columns=["Tweet.ID"]).column("Tweet.ID").to_pylist())
+    return seen
+
+
+# Function to add frequent new words to the dictionary without renumbering existing ones
+def extend_dictionary(dictionary, docs, no_below):
+    new_words = corpora.Dictionary(docs)
+    candidates = [(new_words.dfs[i], w) for w, i in new_words.token2id.items()
+                  if w not in dictionary.token2id and new_words.dfs[i] >= no_below]
+    room = max(0, min(max_new_terms, max_vocab - len(dictionary)))
+    admitted = {w for _, w in sorted(candidates, reverse=True)[:room]}
+    known = set(dictionary.token2id) | admitted
+    # prune_at=None: pruning would compactify the dictionary and shift the ids the model was trained on
+    dictionary.add_documents([[w for w in doc if w in known] for doc in docs], prune_at=None)
+    return len(admitted)
+
+
+# Function to widen the model to a larger dictionary; new words start with no topic counts
+def grow_vocabulary(lda, dictionary):
+    extra = len(dictionary) - lda.num_terms
+    if extra <= 0:
+        return
+    lda.state.sstats = np.hstack([lda.state.sstats, np.zeros((lda.num_topics, extra), dtype=lda.dtype)])
+    eta = np.asarray(lda.eta)
+    pad = np.full(eta.shape[:-1] + (extra,), eta.mean(), dtype=lda.dtype)  # eta is (V,) or (K, V)
+    lda.eta = lda.state.eta = np.concatenate([eta, pad], axis=-1)
+    lda.num_terms = len(dictionary)
+    lda.id2word = dictionary
+    lda.expElogbeta = np.exp(dirichlet_expectation(lda.state.get_lambda())).astype(lda.dtype, copy=False)
+
+
+# Function to compare each topic's word distribution before and after the update
+def topic_drift(before, after, dictionary):
+    before = np.hstack([before, np.zeros((before.shape[0], after.shape[1] - before.shape[1]))])
+    rows = []
+    for t in range(after.shape[0]):
+        old_top = [dictionary[i] for i in np.argsort(before[t])[::-1][:drift_topn]]
+        new_top = [dictionary[i] for i in np.argsort(after[t])[::-1][:drift_topn]]
+        rows.append({"Topic": t, "JS_Distance": jensenshannon(before[t], after[t], base=2),
+                     "Top_Words_Before": " ".join(old_top), "Top_Words_After": " ".join(new_top),
+                     "Entered_Top_Words": " ".join(w for w in new_top if w not in old_top)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    path = version_dir(res_dir, group, version)
+    model = RegisteredModel.load(path, K, mmap=None)  # Writable arrays, since the update changes them
+    lda = model.lda
+    if model.meta["tokenizer"] != tokenizer_config_hash():
+        print(f"⚠️ The tokenizer settings changed since {path} was trained")
+
+    group_path = os.path.join(res_dir, group)
+    df = pd.read_csv(new_csv, dtype={"Tweet.ID": str, "Author.ID": str})
+    df = df[df["Text_nolink"].notnull()]
+    df = df[~df["Tweet.ID"].isin(seen_tweet_ids(group_path))].drop_duplicates("Tweet.ID")
+    if df.empty:
+        print(f"No new tweets for {group}")
+        return
+    print(f"Updating {group} K={K} ({os.path.basename(path)}) with {len(df)} new tweets")
+
+    store = TokenStore(os.path.join(res_dir, "token_store.sqlite"), tokenizer_config_hash())
+    tokens = store.tokens_for(df["Tweet.ID"].tolist(), df["Text_nolink"].astype(str).tolist(), spacy_tokenize_many)
+    store.close()
+    docs = model.docs(tokens)
+
+    before = lda.get_topics()
+    added = extend_dictionary(model.dictionary, docs, model.meta["vocab_settings"]["no_below"])
+    grow_vocabulary(lda, model.dictionary)
+    corpus = [model.dictionary.doc2bow(doc) for doc in docs]
+    lda.update(corpus, chunksize=update_chunksize, passes=update_passes)
+    after = lda.get_topics()
+
+    out_dir = new_version(res_dir, group, model.dictionary, model.phraser, model.stopwords,
+                          dict(model.meta, k_values=[K], parent=os.path.basename(path), n_docs=len(docs)))
+    save_model(lda, out_dir, K)
+    name = f"{os.path.basename(out_dir)}_K{K}"
+
+    updates_dir = os.path.join(group_path, "updates")
+    os.makedirs(updates_dir, exist_ok=True)
+    theta = document_topic_matrix(lda, corpus)
+    write_assignments(os.path.join(updates_dir, f"{name}_assignments.arrow"),
+                      {"Tweet.ID": df["Tweet.ID"].tolist(), "Author.ID": df["Author.ID"].tolist(),
+                       "Text_nolink": df["Text_nolink"].tolist()}, {K: theta.argmax(axis=1)})
+
+    # Metrics over the new rows only, so the cost stays proportional to the update
+    index = CooccurrenceIndex.build(docs, model.dictionary, window_sizes[coherence_measure])
+    words = [w for t in range(K) for w, _ in lda.show_topic(t, topn=10)]
+    metrics = pd.DataFrame([{"Version": os.path.basename(out_dir), "K": K, "New_Docs": len(docs),
+                             "New_Terms": added, "Coherence": coherence(index, top_word_ids(lda), coherence_measure),
+                             "Perplexity": lda.log_perplexity(corpus), "Diversity": len(set(words)) / len(words)}])
+    metrics_path = os.path.join(updates_dir, "metrics.csv")
+    metrics.to_csv(metrics_path, mode="a", header=not os.path.exists(metrics_path), index=False)
+
+    drift = topic_drift(before, after, model.dictionary)
+    drift.to_csv(os.path.join(updates_dir, f"drift_{name}.csv"), index=False)
+    print(f"✅ {len(docs)} tweets, {added} new terms -> {out_dir}; "
+          f"max topic drift (JS distance) {drift['JS_Distance'].max():.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from gensim import utils
+
+"""
+vocab_stats.py
+
+Corpus-wide vocabulary statistics for lda_by_sentiment.py.
+1. Streams texts in chunks through utils.simple_preprocess into term and document-frequency
+   Counters (linear time, optionally across worker processes; chunk results are merged in input order,
+   so the counts and the most_common tie-break match a serial run)
+2. Saves the counts together with the stopword and filter_extremes settings as one JSON artifact,
+   so the stopword set and the dictionary filtering both read the same numbers
+"""
+
+
+def count_chunk(texts):
+    """Term counts, document frequencies and document count for one chunk of texts."""
+    term_counts = Counter()
+    doc_freqs = Counter()
+    for text in texts:
+        tokens = utils.simple_preprocess(text)
+        term_counts.update(tokens)
+        doc_freqs.update(set(tokens))
+    return term_counts, doc_freqs, len(texts)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class VocabStats:
+    def __init__(self, term_counts, doc_freqs, n_docs, settings):
+        self.term_counts = term_counts
+        self.doc_freqs = doc_freqs
+        self.n_docs = n_docs
+        self.settings = settings
+
+    @classmethod
+    def build(cls, texts, settings, chunksize=5000, n_workers=1):
+        """
+        texts may be any iterable (e.g. a generator); it is consumed one chunk at a time, with at most
+        2 x n_workers chunks read ahead when counting across worker processes.
+        """
+        term_counts, doc_freqs, n_docs = Counter(), Counter(), 0
+
+        def add(part):
+            nonlocal n_docs
+            counts, freqs, n = part
+            term_counts.update(counts)
+            doc_freqs.update(freqs)
+            n_docs += n
+
+        if n_workers > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                pending = deque()
+                for chunk in chunks(texts, chunksize):
+                    if len(pending) >= 2 * n_workers:
+                        add(pending.popleft().result())
+                    pending.append(pool.submit(count_chunk, chunk))
+                while pending:
+                    add(pending.popleft().result())
+        else:
+            for chunk in chunks(texts, chunksize):
+                add(count_chunk(chunk))
+        return cls(term_counts, doc_freqs, n_docs, settings)
+
+    def top_terms(self, n=None):
+        """The n most frequent terms (n defaults to the stored top_n_stopwords setting)."""
+        n = self.settings["top_n_stopwords"] if n is None else n
+        return {w for w,_ in self.term_counts.most_common(n)}
+
+    def filter_extremes_kwargs(self):
+        return {"no_below":self.settings["no_below"], "no_above":self.settings["no_above"]}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"n_docs":self.n_docs, "settings":self.settings,
+                       "terms":{w:[c, self.doc_freqs[w]] for w,c in self.term_counts.most_common()}}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        terms = data["terms"]
+        return cls(Counter({w:c for w,(c,_) in terms.items()}), Counter({w:d for w,(_,d) in terms.items()}),
+                   data["n_docs"], data["settings"])
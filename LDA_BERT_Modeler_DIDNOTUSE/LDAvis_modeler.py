@@ -1,4 +1,5 @@
 import os
+import numpy as np
 import pandas as pd
 import gensim
 from gensim import corpora
@@ -13,6 +14,7 @@ and generates:
 1. pyLDAvis interactive visualizations for topics ranging from 3 to 10.
 2. Saves trained LDA models as '.model' files for reuse.
 3. Saves tweet-level topic assignments in CSV format.
+4. Saves the full document-topic matrix as 'theta_{K}_topics.npy'.
 """
 
 # Define file paths
@@ -28,6 +30,16 @@ tokens = df["tokens"].apply(eval).tolist()  # Convert string lists back to lists
 dictionary = corpora.Dictionary(tokens)
 corpus = [dictionary.doc2bow(text) for text in tokens]
 
+
+# Function to get the full document-topic matrix in batches (rows sum to 1)
+def document_topic_matrix(lda_model, corpus, chunksize=2000):
+    theta = np.empty((len(corpus), lda_model.num_topics), dtype=np.float32)
+    for start in range(0, len(corpus), chunksize):
+        gamma, _ = lda_model.inference(corpus[start:start + chunksize])
+        theta[start:start + len(gamma)] = gamma / gamma.sum(axis=1, keepdims=True)
+    return theta
+
+
 # Ensure results folder exists
 os.makedirs(results_folder, exist_ok=True)
 
@@ -61,7 +73,9 @@ for num_topics in range(3, 11):
     print(f"Saved visualization: {topic_folder}lda_viz.html")
 
     # Assign topics to tweets
-    df["Topic"] = [max(lda_model.get_document_topics(bow), key=lambda x: x[1])[0] for bow in corpus]
+    theta = document_topic_matrix(lda_model, corpus)
+    np.save(f"{topic_folder}theta_{num_topics}_topics.npy", theta)
+    df["Topic"] = theta.argmax(axis=1)
 
     # Save topic assignments CSV
     output_csv = f"{topic_folder}topic_assignments_{num_topics}_topics.csv"
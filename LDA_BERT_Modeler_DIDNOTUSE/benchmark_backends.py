@@ -0,0 +1,84 @@
+import glob
+import multiprocessing
+import os
+import time
+import numpy as np
+import pandas as pd
+import psutil
+import torch
+from classifier_backends import load_scorer
+from sentiment_emotion_analysis import classify_texts, is_missing, tokenizer, model_name, export_dir, num_threads, max_length
+
+"""
+benchmark_backends.py
+
+Compares the classifier backends in classifier_backends.py on the tweets in Data/*.csv:
+1. Each backend runs in a fresh process, so its resident memory is measured on its own
+2. Reports tweets/sec (export and loading excluded) and RSS after loading and after classifying
+3. Reports agreement with the FP32 labels, for the dominant emotion and the mapped sentiment
+4. Compares raw logits with FP32 on probe batches of several shapes (one short text, mixed lengths with
+   padding, texts truncated at max_length), so an export that only works for one shape shows up
+psutil is needed for the RSS figures; nothing else in the repo uses it.
+"""
+
+data_glob = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data", "*.csv")
+compare_backends = ["fp32", "int8", "onnx", "onnx_int8"]  # fp32 first: it is the reference
+max_rows = None  # e.g. 2000 for a quick run
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 1e6
+
+
+# Function to pick probe batches of different shapes from the texts
+def probe_batches(texts):
+    present = sorted((t for t in texts if not is_missing(t)), key=len)
+    spread = lambda n: [present[i] for i in np.linspace(0, len(present) - 1, n).astype(int)]
+    batches = [present[:1], spread(4), present[-16:], spread(64)]
+    return [tokenizer(batch, truncation=True, max_length=max_length, padding=True, return_tensors="pt")
+            for batch in batches]
+
+
+# Function to classify all texts with one backend (runs in its own process)
+def run_backend(backend, texts):
+    logits = load_scorer(backend, model_name, export_dir, num_threads)
+    loaded_mb = rss_mb()
+    start = time.perf_counter()
+    labels = classify_texts(texts, lambda inputs: logits(inputs).argmax(axis=-1).tolist())
+    seconds = time.perf_counter() - start
+    final_mb = rss_mb()
+    with torch.inference_mode():
+        probes = [logits(inputs) for inputs in probe_batches(texts)]
+    return labels, seconds, loaded_mb, final_mb, probes
+
+
+def load_texts():
+    texts = []
+    for path in sorted(glob.glob(data_glob)):
+        texts += pd.read_csv(path, usecols=["Text_nolink"])["Text_nolink"].tolist()
+    return texts[:max_rows] if max_rows else texts
+
+
+if __name__ == "__main__":
+    texts = load_texts()
+    print(f"{len(texts)} texts from {data_glob}, {num_threads} thread(s)")
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    reference = None
+    for backend in compare_backends:
+        with context.Pool(1) as pool:
+            labels, seconds, loaded_mb, final_mb, probes = pool.apply(run_backend, (backend, texts))
+        if reference is None:
+            reference, reference_probes = labels, probes
+        scored = [(a, b) for a, b in zip(reference, labels) if a[1] != "Missing"]
+        for ref, out in zip(reference_probes, probes):
+            print(f"{backend} probe {ref.shape[0]} texts: max |logit - fp32| {np.abs(out - ref).max():.4f}, "
+                  f"argmax agreement {(out.argmax(-1) == ref.argmax(-1)).mean():.3f}")
+        rows.append({"Backend": backend, "Tweets/sec": round(len(texts) / seconds, 1),
+                     "RSS loaded (MB)": round(loaded_mb), "RSS after run (MB)": round(final_mb),
+                     "Emotion agreement": round(sum(a[1] == b[1] for a, b in scored) / len(scored), 4),
+                     "Sentiment agreement": round(sum(a[0] == b[0] for a, b in scored) / len(scored), 4),
+                     "Max probe logit diff": round(float(max(np.abs(o - r).max() for o, r in zip(probes, reference_probes))), 4)})
+        print(rows[-1])
+
+    print(pd.DataFrame(rows).to_string(index=False))
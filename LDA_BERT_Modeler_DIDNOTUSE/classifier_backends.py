@@ -0,0 +1,110 @@
+import os
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+"""
+classifier_backends.py
+
+CPU serving paths for the emotion classifier in sentiment_emotion_analysis.py. Every backend returns a
+predict(inputs) function mapping a padded tokenizer batch to predicted label indices.
+1. "fp32": the original transformers model
+2. "int8": dynamic int8 quantization of the Linear layers, served as the eager module (batch size and
+   sequence length stay free, padding included); only the quantized weights are cached
+3. "onnx": ONNX export served by onnxruntime, traced on padded batches of real tokenized text
+4. "onnx_int8": the ONNX export with int8 weights (onnxruntime dynamic quantization)
+Exports are written once to export_dir and reused; the cached backends never load the FP32 weights.
+"""
+
+backends = ["fp32", "int8", "onnx", "onnx_int8"]
+
+# Texts of different lengths for the ONNX trace, so the example batch is padded like real batches
+example_texts = ["Fluoride again.",
+                 "They keep adding fluoride to the water and nobody asked us whether we wanted it.",
+                 "Dentists say it helps, but I still want to read the studies myself before deciding."]
+
+
+def export_path(export_dir, model_name, backend):
+    slug = model_name.replace("/", "--")
+    return os.path.join(export_dir, f"{slug}_int8_dynamic.pt" if backend == "int8" else f"{slug}_{backend}.onnx")
+
+
+def example_inputs(model_name):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    inputs = tokenizer(example_texts, padding=True, return_tensors="pt")
+    return inputs["input_ids"], inputs["attention_mask"]
+
+
+def quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_int8(model_name, path):
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    torch.save(quantize(model).state_dict(), path)
+
+
+def load_int8(model_name, path):
+    # Rebuild the architecture from the config alone, quantize it, then load the cached int8 weights
+    model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(model_name)).eval()
+    quantized = quantize(model)
+    quantized.load_state_dict(torch.load(path, weights_only=False))
+    return quantized
+
+
+def export_onnx(model_name, path):
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    dynamic = {0: "batch", 1: "sequence"}
+    torch.onnx.export(model, example_inputs(model_name), path, input_names=["input_ids", "attention_mask"],
+                      output_names=["logits"], opset_version=14, dynamo=False,
+                      dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "logits": {0: "batch"}})
+
+
+def export_onnx_int8(model_name, path, export_dir):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    source = export_path(export_dir, model_name, "onnx")
+    if not os.path.exists(source):
+        export_onnx(model_name, source)
+    quantize_dynamic(source, path, weight_type=QuantType.QInt8)
+
+
+def load_scorer(backend, model_name, export_dir, num_threads):
+    """Returns logits(inputs) -> (batch, labels) numpy array for the backend, exporting it to export_dir if needed."""
+    if backend not in backends:
+        raise ValueError(f"Unknown model backend {backend!r}; expected one of {backends}")
+
+    if backend == "fp32":
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        return lambda inputs: model(**inputs).logits.numpy()
+
+    path = export_path(export_dir, model_name, backend)
+    if not os.path.exists(path):
+        os.makedirs(export_dir, exist_ok=True)
+        print(f"Exporting {model_name} ({backend}) to {path}...")
+        if backend == "int8":
+            export_int8(model_name, path)
+        elif backend == "onnx":
+            export_onnx(model_name, path)
+        else:
+            export_onnx_int8(model_name, path, export_dir)
+
+    if backend == "int8":
+        module = load_int8(model_name, path)
+        return lambda inputs: module(input_ids=inputs["input_ids"],
+                                     attention_mask=inputs["attention_mask"]).logits.numpy()
+
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def logits(inputs):
+        feed = {"input_ids": inputs["input_ids"].numpy(), "attention_mask": inputs["attention_mask"].numpy()}
+        return session.run(["logits"], feed)[0]
+
+    return logits
+
+
+def load_predictor(backend, model_name, export_dir, num_threads):
+    """Returns predict(inputs) for the backend, exporting the model to export_dir first if needed."""
+    logits = load_scorer(backend, model_name, export_dir, num_threads)
+    return lambda inputs: logits(inputs).argmax(axis=-1).tolist()
@@ -1,7 +1,9 @@
 import os
+import time
 import pandas as pd
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
+from classifier_backends import load_predictor
 
 """
 01_sentiment_emotion_analysis.py
@@ -15,6 +17,9 @@ This script applies sentiment and emotion classification to:
 - Outputs 'Sentiment' (Positive, Neutral, Negative).
 - Outputs 'Dominant Emotion' (7-class emotion).
 - If text is missing, sets both Sentiment & Emotion to "Missing".
+- Texts are classified in batches: sorted by token length, padded per batch and capped by a token budget.
+- model_backend selects the FP32 model or a cached int8 / ONNX export (see classifier_backends.py and
+  benchmark_backends.py for agreement and speed).
 - Saves results back to the same CSV files.
 """
 
@@ -25,7 +30,17 @@ files = ["fluoride_tweets.csv", "user_tweets.csv", "common_users_tweets.csv"]
 # Load the GoEmotions model
 model_name = "j-hartmann/emotion-english-distilroberta-base"
 tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name)
+
+# "fp32", "int8" (dynamic quantization), "onnx" or "onnx_int8" (onnxruntime); exports are cached here
+model_backend = "fp32"
+export_dir = "D:/pythonProject/models/"
+
+# Batching: padded tokens per batch (batch size x longest text in it), and intra-op CPU threads
+max_length = 128
+batch_token_budget = 4096
+max_batch_size = 64
+num_threads = os.cpu_count() or 1
+torch.set_num_threads(num_threads)
 
 # Define emotion labels (7-class output)
 emotion_labels = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
@@ -41,49 +56,78 @@ sentiment_map = {
     "neutral": "Neutral"
 }
 
-def classify_text(text):
+def is_missing(text):
+    return pd.isna(text) or not isinstance(text, str) or text.strip() == ""
+
+def length_batches(lengths, token_budget=batch_token_budget, batch_size=max_batch_size):
+    """Groups positions sorted by length so each batch's padded size stays within token_budget."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current = [], []
+    for i in order:
+        # Sorted ascending, so the text being added is the longest in the batch
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[i] > token_budget):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+def classify_texts(texts, predict):
+    """Predicts (Sentiment, Dominant Emotion) for each text, in the original order, with a load_predictor() function."""
+    results = [("Missing", "Missing")] * len(texts)  # Assign "Missing" if no text
+    positions = [i for i, text in enumerate(texts) if not is_missing(text)]
+    if not positions:
+        return results
+
+    # Tokenize once without padding; each batch is padded only to its own longest text
+    encoded = tokenizer([texts[i] for i in positions], truncation=True, max_length=max_length)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    with torch.inference_mode():
+        for batch in length_batches(lengths):
+            inputs = tokenizer.pad({key: [encoded[key][j] for j in batch] for key in encoded.keys()},
+                                   return_tensors="pt")
+            # The dominant emotion is the highest logit (same as the highest softmax probability)
+            for j, label in zip(batch, predict(inputs)):
+                dominant_emotion = emotion_labels[label]
+                # Map dominant emotion to sentiment
+                results[positions[j]] = (sentiment_map[dominant_emotion], dominant_emotion)
+    return results
+
+def classify_text(text, predict):
     """Predicts Sentiment and Dominant Emotion for a given text."""
-    if pd.isna(text) or not isinstance(text, str) or text.strip() == "":
-        return "Missing", "Missing"  # Assign "Missing" if no text
-
-    # Tokenize text
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=128)
-
-    # Run model & get predictions
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)[0].tolist()
-
-    # Get the dominant emotion (highest probability)
-    dominant_emotion = emotion_labels[probs.index(max(probs))]
-
-    # Map dominant emotion to sentiment
-    sentiment = sentiment_map[dominant_emotion]
+    return classify_texts([text], predict)[0]
 
-    return sentiment, dominant_emotion
+if __name__ == "__main__":
+    predict = load_predictor(model_backend, model_name, export_dir, num_threads)
 
-# Process each file
-for file in files:
-    file_path = os.path.join(data_folder, file)
+    # Process each file
+    for file in files:
+        file_path = os.path.join(data_folder, file)
 
-    if not os.path.exists(file_path):
-        print(f"Skipping {file} - File not found.")
-        continue
+        if not os.path.exists(file_path):
+            print(f"Skipping {file} - File not found.")
+            continue
 
-    print(f"Processing {file}...")
+        print(f"Processing {file}...")
 
-    # Load data
-    df = pd.read_csv(file_path)
+        # Load data
+        df = pd.read_csv(file_path)
 
-    if "Text_nolink" not in df.columns:
-        print(f"Skipping {file} - 'Text_nolink' column not found.")
-        continue
+        if "Text_nolink" not in df.columns:
+            print(f"Skipping {file} - 'Text_nolink' column not found.")
+            continue
 
-    # Apply classification
-    df[["Sentiment", "Dominant Emotion"]] = df["Text_nolink"].apply(lambda x: pd.Series(classify_text(x)))
+        # Apply classification
+        start = time.perf_counter()
+        labels = classify_texts(df["Text_nolink"].tolist(), predict)
+        df[["Sentiment", "Dominant Emotion"]] = pd.DataFrame(labels, index=df.index)
+        print(f"Classified {len(df)} rows in {time.perf_counter() - start:.1f}s "
+              f"on {num_threads} thread(s) ({model_backend})")
 
-    # Save updated file
-    df.to_csv(file_path, index=False)
-    print(f"Updated file saved: {file_path}")
+        # Save updated file
+        df.to_csv(file_path, index=False)
+        print(f"Updated file saved: {file_path}")
 
-print("\nSentiment & Emotion classification completed for all files.")
+    print("\nSentiment & Emotion classification completed for all files.")
@@ -1,29 +1,91 @@
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 
-def collect_unique_author_ids(folder_path, save_path):
-    # List all CSV files in the folder
-    file_list = [file for file in os.listdir(folder_path) if file.endswith('.csv')]
-
-    # Initialize a set to collect unique Author IDs
-    unique_author_ids = set()
-
-    # Loop through each file and read the Author ID column
-    for file_name in file_list:
-        full_path = os.path.join(folder_path, file_name)
-        try:
-            df = pd.read_csv(full_path)
-            if 'Author ID' in df.columns:
-                unique_author_ids.update(df['Author ID'].unique())
-        except Exception as e:
-            print(f"Failed to process {file_name}: {e}")
-
-    # Convert the unique Author IDs to a DataFrame and save as a CSV file
-    unique_ids_df = pd.DataFrame({'Unique Author ID': list(unique_author_ids)})
-    unique_ids_df.to_csv(save_path, index=False)
-    print(f"Unique Author IDs saved to {save_path}")
-
-# Example usage
-folder_path = r"path/to/mainfolder"
-save_path = r"path/to/uniqueID.csv"
-collect_unique_author_ids(folder_path, save_path)
+# Harvesting settings
+n_workers = os.cpu_count() or 1  # Processes reading CSVs in parallel
+files_per_task = 16  # CSVs handed to a worker at a time
+
+def manifest_path_for(save_path):
+    # Harvested files (name -> [size, mtime]) are recorded next to uniqueID.csv
+    return os.path.splitext(save_path)[0] + "_manifest.json"
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+def write_atomic(path, write):
+    # Write to a temp file first so an interrupted run never leaves a half-written file behind
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+# Function to read only the Author ID column of one CSV (runs in a worker process)
+def read_author_ids(full_path):
+    # Empty window files and CSVs without an Author ID column hold no IDs; they are harvested, not failed
+    no_ids = np.array([], dtype=np.int64)
+    try:
+        df = pd.read_csv(full_path, usecols=lambda column: column == "Author ID", dtype={"Author ID": "Int64"})
+    except pd.errors.EmptyDataError:
+        return no_ids, None
+    except Exception as e:
+        return no_ids, str(e)
+    if "Author ID" not in df.columns:
+        return no_ids, None
+    return np.unique(df["Author ID"].dropna().to_numpy(dtype=np.int64)), None
+
+def collect_unique_author_ids(folder_path, save_path, store_path=None):
+    # Skip CSVs whose size and modification time match the manifest from the last run
+    manifest_path = manifest_path_for(save_path)
+    manifest = load_json(manifest_path, {})
+    file_list = sorted(file for file in os.listdir(folder_path) if file.endswith('.csv'))
+    stats = {file: os.stat(os.path.join(folder_path, file)) for file in file_list}
+    new_files = [file for file in file_list if manifest.get(file) != [stats[file].st_size, stats[file].st_mtime]]
+    print(f"{len(file_list)} CSV files, {len(new_files)} new or changed since the last run")
+
+    # Read the Author ID column of the new files across a process pool
+    harvested = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        results = pool.map(read_author_ids, [os.path.join(folder_path, f) for f in new_files], chunksize=files_per_task)
+        for file_name, (ids, error) in zip(new_files, results):
+            if error is not None:
+                print(f"Failed to process {file_name}: {error}")  # Not recorded, so it is retried next run
+                continue
+            harvested.append(ids)
+            manifest[file_name] = [stats[file_name].st_size, stats[file_name].st_mtime]
+
+    # Authors already in the tweet store (tweet_store.py), read from its author index
+    if store_path:
+        from tweet_store import TweetStore
+        store = TweetStore(store_path)
+        harvested.append(np.array(store.author_ids(), dtype=np.int64))
+        store.close()
+
+    # Merge into the existing uniqueID.csv: known IDs keep their order, new ones are appended
+    if os.path.exists(save_path):
+        existing = pd.read_csv(save_path, dtype={'Unique Author ID': np.int64})['Unique Author ID'].to_numpy()
+    else:
+        existing = np.array([], dtype=np.int64)
+    found = np.unique(np.concatenate(harvested)) if harvested else np.array([], dtype=np.int64)
+    new_ids = found[~np.isin(found, existing)]
+    unique_ids_df = pd.DataFrame({'Unique Author ID': np.concatenate([existing, new_ids])})
+
+    # The manifest is written after the IDs, so a crash in between only means re-reading some files
+    write_atomic(save_path, lambda path: unique_ids_df.to_csv(path, index=False))
+    write_atomic(manifest_path, lambda path: write_json(path, manifest))
+    print(f"{len(new_ids)} new Author IDs ({len(unique_ids_df)} in total) saved to {save_path}")
+
+if __name__ == "__main__":
+    # Example usage
+    folder_path = r"path/to/mainfolder"
+    save_path = r"path/to/uniqueID.csv"
+    store_path = None  # e.g. os.path.join(folder_path, "tweets.sqlite") to include the tweet store
+    collect_unique_author_ids(folder_path, save_path, store_path)
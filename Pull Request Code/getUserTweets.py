@@ -3,13 +3,55 @@ import pandas as pd
 import tweepy
 import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor
 from getKeys import getKeys  # Import the function to retrieve API keys
-
-def pull_tweets_for_author_subset(client, author_ids, save_location, start_time, end_time, time_window_minutes=60, no_of_tweets=10, query="", index=0):
-    total_tweets_pulled = 0
+from rate_scheduler import RateScheduler, ScheduledClient
+from tweet_store import TweetStore
+
+# Request budget shared with main.py (use the same file in both)
+rate_budget_path = r"path/to/rate_budget.sqlite"
+max_attempts = 5  # Tries per window before moving on
+retry_delay = 30
+max_workers = 4  # Author subsets fetched concurrently
+
+# Author packing: each query holds as many from: terms as fit in the search query limit
+max_query_length = 512  # Query character limit for the account's access level
+tweets_per_author = 1  # An author is dropped from its query once this many of their tweets are pulled
+query_filters = "lang:en -is:retweet -is:quote -has:links -has:media -has:images -has:video_link"
+
+def author_query(author_ids):
+    return f"({' OR '.join([f'from:{author_id}' for author_id in author_ids])}) {query_filters}"
+
+def pack_authors(author_ids, max_length=max_query_length):
+    """Splits author IDs into consecutive groups whose author_query fits within max_length characters."""
+    packs = []
+    current = []
+    for author_id in author_ids:
+        if current and len(author_query(current + [author_id])) > max_length:
+            packs.append(current)
+            current = []
+        current.append(author_id)
+    if current:
+        packs.append(current)
+    return packs
+
+def packing_report(author_ids, windows, batch_size=10):
+    """Prints queries and worst-case requests (every query runs every window) for packed vs fixed batches."""
+    fixed = -(-len(author_ids) // batch_size)
+    packed = len(pack_authors(author_ids))
+    print(f"{len(author_ids)} authors: {packed} packed queries (up to {max_query_length} characters) "
+          f"vs {fixed} batches of {batch_size}")
+    print(f"At most {packed * windows} vs {fixed * windows} requests over {windows} windows "
+          f"({(fixed - packed) * windows} saved)")
+    return fixed, packed
+
+def pull_tweets_for_author_subset(client, author_ids, save_location, start_time, end_time, time_window_minutes=60, tweets_per_author=1, index=0, store=None):
+    pulled = {author_id: 0 for author_id in author_ids}  # Tweets pulled per author
     author_ids_copy = author_ids[:]  # Use a copy so we can modify it without affecting the original list
+    attempt = 1
+    requests_made = 0
 
-    while total_tweets_pulled < no_of_tweets and author_ids_copy:
+    while author_ids_copy:
         # Ensure end_time does not exceed the specified window (6 days 23 hours ago to 1 hour ago)
         if start_time >= end_time:
             break
@@ -19,16 +61,15 @@ def pull_tweets_for_author_subset(client, author_ids, save_location, start_time,
         current_end_time = min(end_time, start_time + datetime.timedelta(minutes=time_window_minutes))
         end_date = current_end_time.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-        # Build author-specific query
-        author_query = f"({' OR '.join([f'from:{author_id}' for author_id in author_ids_copy])}) lang:en -is:retweet -is:quote -has:links -has:media -has:images -has:video_link"
-
         try:
-            # Fetch tweets for the specific authors
+            # Fetch tweets for the authors still short of their quota
+            requests_made += 1
+            still_wanted = sum(tweets_per_author - pulled[author_id] for author_id in author_ids_copy)
             tweets = client.search_recent_tweets(
-                query=author_query,
+                query=author_query(author_ids_copy),
                 start_time=start_date,
                 end_time=end_date,
-                max_results=no_of_tweets,
+                max_results=min(100, max(10, still_wanted)),
                 tweet_fields=[
                     "id", "text", "author_id", "created_at", "public_metrics", "source",
                     "lang", "geo", "possibly_sensitive", "referenced_tweets", "reply_settings"
@@ -40,8 +81,10 @@ def pull_tweets_for_author_subset(client, author_ids, save_location, start_time,
             # Collect tweet data
             attributes_container = []
             if tweets.data:
-                seen_authors = set()  # Track authors from whom tweets have been pulled
                 for tweet in tweets.data:
+                    # Skip tweets from authors whose quota is already met
+                    if pulled.get(tweet.author_id, tweets_per_author) >= tweets_per_author:
+                        continue
                     tweet_data = {
                         "Tweet ID": tweet.id,
                         "Text": tweet.text,
@@ -55,18 +98,16 @@ def pull_tweets_for_author_subset(client, author_ids, save_location, start_time,
                         "Public Metrics": tweet.public_metrics
                     }
                     attributes_container.append(tweet_data)
-                    total_tweets_pulled += 1
-                    seen_authors.add(tweet.author_id)
+                    pulled[tweet.author_id] += 1
 
-                    # Stop if we reach the desired number of tweets
-                    if total_tweets_pulled >= no_of_tweets:
-                        break
+                # Remove authors who reached their quota in this iteration
+                author_ids_copy = [author_id for author_id in author_ids_copy if pulled[author_id] < tweets_per_author]
 
-                # Remove authors who had tweets pulled in this iteration
-                author_ids_copy = [author_id for author_id in author_ids_copy if author_id not in seen_authors]
-
-            # Save collected tweets to a CSV file
-            if attributes_container:
+            # Append collected tweets to the store (duplicates are dropped), or save them to a CSV file
+            if attributes_container and store is not None:
+                added = store.add(attributes_container)
+                print(f"{len(attributes_container)} tweets from {start_date}, {added} new in {store.path}")
+            elif attributes_container:
                 tweets_df = pd.DataFrame(attributes_container)
                 filename = f"{index}_tweets_{start_date.replace(':', '').replace('T', '_')}_to_{end_date.replace(':', '').replace('T', '_')}.csv"
                 save_path = os.path.join(save_location, filename)
@@ -74,18 +115,31 @@ def pull_tweets_for_author_subset(client, author_ids, save_location, start_time,
                 print(f"Tweets saved to {save_path}")
 
         except tweepy.TooManyRequests:
-            print("Rate limit exceeded. Waiting for 30 minutes before retrying...")
-            time.sleep(1800)  # Wait for 30 minutes before retrying
+            # The scheduler now holds requests until the reset time, so the window is retried right away
+            if attempt < max_attempts:
+                print(f"Rate limit exceeded. Retrying the window when the budget resets (attempt {attempt + 1})...")
+                attempt += 1
+                continue
+            print(f"Rate limit exceeded {max_attempts} times; skipping the window")
         except BaseException as e:
             print('Status Failed On,', str(e))
+            if attempt < max_attempts:
+                print(f"Retrying the window in {retry_delay * attempt} seconds (attempt {attempt + 1})")
+                time.sleep(retry_delay * attempt)
+                attempt += 1
+                continue
 
         # Move time window forward
         start_time = current_end_time
+        attempt = 1
+
+    return requests_made
 
 def main():
     # Load unique author IDs
     unique_ids_path = r"path/to/uniqueID.csv"
     save_location = r"path/to/fluoride_dataset"
+    store_path = os.path.join(save_location, "tweets.sqlite")  # Deduplicated tweet store; None for a CSV per window
     df = pd.read_csv(unique_ids_path)
     unique_author_ids = df['Unique Author ID'].tolist()
 
@@ -98,9 +152,10 @@ def main():
     access_token = globals()['access_token']
     access_token_secret = globals()['access_token_secret']
 
-    # Initialize Twitter API client
-    client = tweepy.Client(bearer_token=bearer_token, consumer_key=consumer_key, consumer_secret=consumer_secret,
-                           access_token=access_token, access_token_secret=access_token_secret, wait_on_rate_limit=True)
+    # Initialize Twitter API client; requests draw from the budget shared with main.py
+    client = ScheduledClient(bearer_token=bearer_token, consumer_key=consumer_key, consumer_secret=consumer_secret,
+                             access_token=access_token, access_token_secret=access_token_secret,
+                             scheduler=RateScheduler(rate_budget_path, "getUserTweets"))
 
     # Set time parameters for the overall window
     end_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1)
@@ -111,14 +166,21 @@ def main():
     if base_start_time < api_minimum_time:
         base_start_time = api_minimum_time
 
-    # Loop through unique author IDs in subsets of 10 with indexing for unique filenames
-    batch_size = 10
-    index = 1  # Start index for filenames
-    for i in range(0, len(unique_author_ids), batch_size):
-        subset = unique_author_ids[i:i + batch_size]
-        start_time = base_start_time  # Reset start_time to base_start_time for each new batch
-        pull_tweets_for_author_subset(client, subset, save_location, start_time, end_time, time_window_minutes=360, index=index)
-        index += 1  # Increment index for the next file
+    # Pack the author IDs into as few queries as the query length allows, with indexing for unique filenames;
+    # max_workers subsets run at once, paced by the shared budget
+    time_window_minutes = 360
+    windows = -(-int((end_time - base_start_time).total_seconds()) // (time_window_minutes * 60))
+    packing_report(unique_author_ids, windows)
+    store = TweetStore(store_path) if store_path else None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for index, subset in enumerate(pack_authors(unique_author_ids), start=1):
+            start_time = base_start_time  # Every subset covers the whole window
+            futures.append(pool.submit(pull_tweets_for_author_subset, client, subset, save_location, start_time,
+                                       end_time, time_window_minutes=time_window_minutes,
+                                       tweets_per_author=tweets_per_author, index=index, store=store))
+        requests_made = sum(future.result() for future in futures)
+    print(f"Made {requests_made} requests")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,134 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import tweepy
+
+"""
+rate_scheduler.py
+
+Request budget shared by every collector (main.py, getUserTweets.py) that points at the same budget file:
+1. One token bucket per endpoint, stored in SQLite so separate processes draw from the same budget
+2. Buckets are corrected from the x-rate-limit-limit / -remaining / -reset headers of every response,
+   and emptied until the reset time when a 429 comes back
+3. Each collector takes at most its fair share (limit / active collectors) of a rate-limit window,
+   so one collector cannot starve the others; an idle collector's share goes to the rest
+ScheduledClient is a tweepy.Client that waits for a token before each request instead of using wait_on_rate_limit.
+"""
+
+default_limit = 60  # Requests per window assumed for an endpoint until its first response headers arrive
+default_window_seconds = 900
+active_seconds = 60  # A collector that asked for a token this recently counts towards the fair share
+
+
+class RateScheduler:
+    def __init__(self, path, name=None, poll_seconds=1.0):
+        self.path = path
+        self.name = name or f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_seconds = poll_seconds
+        self.local = threading.local()
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS buckets (
+                            endpoint TEXT PRIMARY KEY, request_limit INTEGER, remaining INTEGER, reset_at REAL)""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS collectors (
+                            name TEXT, endpoint TEXT, last_seen REAL, used INTEGER, reset_at REAL,
+                            PRIMARY KEY (name, endpoint))""")
+
+    def _conn(self):
+        # One connection per thread; transactions are opened explicitly with BEGIN IMMEDIATE
+        if not hasattr(self.local, "conn"):
+            self.local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return self.local.conn
+
+    def _bucket(self, conn, endpoint, now):
+        row = conn.execute("SELECT request_limit, remaining, reset_at FROM buckets WHERE endpoint = ?",
+                           (endpoint,)).fetchone()
+        if row is None or now >= row[2]:
+            limit = row[0] if row else default_limit
+            row = (limit, limit, now + default_window_seconds)
+            conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (endpoint,) + row)
+        return row
+
+    def _try_acquire(self, endpoint):
+        """Takes a token and returns 0, or returns how long to wait before asking again."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            limit, remaining, reset_at = self._bucket(conn, endpoint, now)
+            mine = conn.execute("SELECT used, reset_at FROM collectors WHERE name = ? AND endpoint = ?",
+                                (self.name, endpoint)).fetchone()
+            used = mine[0] if mine and mine[1] == reset_at else 0
+            conn.execute("INSERT OR REPLACE INTO collectors VALUES (?, ?, ?, ?, ?)",
+                         (self.name, endpoint, now, used, reset_at))
+            active = conn.execute("SELECT COUNT(*) FROM collectors WHERE endpoint = ? AND last_seen >= ?",
+                                  (endpoint, now - active_seconds)).fetchone()[0]
+            if remaining > 0 and used < math.ceil(limit / max(active, 1)):
+                conn.execute("UPDATE buckets SET remaining = remaining - 1 WHERE endpoint = ?", (endpoint,))
+                conn.execute("UPDATE collectors SET used = used + 1 WHERE name = ? AND endpoint = ?",
+                             (self.name, endpoint))
+                wait = 0
+            else:
+                wait = reset_at - now if remaining <= 0 else self.poll_seconds
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return max(wait, 0)
+
+    def acquire(self, endpoint):
+        while True:
+            wait = self._try_acquire(endpoint)
+            if wait == 0:
+                return
+            time.sleep(min(wait, self.poll_seconds * 10) + 0.01)
+
+    def update(self, endpoint, headers, exhausted=False):
+        """Corrects the bucket from a response's rate-limit headers (exhausted: the response was a 429)."""
+        try:
+            limit = int(headers["x-rate-limit-limit"])
+            remaining = 0 if exhausted else int(headers["x-rate-limit-remaining"])
+            reset_at = float(headers["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            if not exhausted:
+                return
+            limit, remaining, reset_at = None, 0, time.time() + default_window_seconds
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._bucket(conn, endpoint, time.time())
+            limit = limit or row[0]
+            if abs(row[2] - reset_at) < 2:
+                # Same window: responses can arrive out of order, so keep the lower count
+                remaining = min(remaining, row[1])
+                reset_at = row[2]
+            conn.execute("UPDATE buckets SET request_limit = ?, remaining = ?, reset_at = ? WHERE endpoint = ?",
+                         (limit, remaining, reset_at, endpoint))
+            conn.execute("UPDATE collectors SET reset_at = ? WHERE endpoint = ? AND reset_at = ?",
+                         (reset_at, endpoint, row[2]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class ScheduledClient(tweepy.Client):
+    """tweepy.Client whose requests wait for a token from a RateScheduler and report the rate-limit headers."""
+
+    def __init__(self, *args, scheduler, **kwargs):
+        kwargs["wait_on_rate_limit"] = False  # The scheduler does the waiting
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        self.scheduler.acquire(route)
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except tweepy.TooManyRequests as e:
+            self.scheduler.update(route, e.response.headers, exhausted=True)
+            raise
+        self.scheduler.update(route, response.headers)
+        return response
@@ -0,0 +1,181 @@
+import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+import pandas as pd
+import requests
+import tweepy
+from window_fetcher import fetch_range, parse_iso
+from rate_scheduler import RateScheduler
+from tweet_store import TweetStore
+
+"""
+stub_search.py
+
+Local stand-in for client.search_recent_tweets, used to test window_fetcher.py and rate_scheduler.py
+without API calls:
+1. Serves a synthetic timeline with quiet hours and bursts, newest first, start_time inclusive and
+   end_time exclusive, in pages of max_results with next_token like the real endpoint
+2. Can fail after a set number of requests, to exercise requeueing and checkpoint resume
+3. Can enforce a request limit per window with x-rate-limit-* headers and 429s, optionally shared by
+   several stub clients, to exercise the shared scheduler
+Run this file directly to run the checks (windows, shared budget, tweet store).
+"""
+
+# Stub settings
+stub_days = 3
+stub_seed = 7
+search_route = "/2/tweets/search/recent"
+
+
+def make_timeline(start_time, days, seed):
+    """Tweet IDs and timestamps: a few tweets per hour, with some hours of several hundred."""
+    rng = random.Random(seed)
+    tweets = []
+    for hour in range(days * 24):
+        count = rng.choice([0, 1, 3, 5, 10]) if rng.random() > 0.1 else rng.randint(200, 900)
+        for _ in range(count):
+            created = start_time + datetime.timedelta(hours=hour, seconds=rng.randrange(3600))
+            tweets.append(created)
+    tweets.sort()
+    return [{"id": 10 ** 18 + i, "created_at": created, "author_id": rng.randrange(1000), "text": f"tweet {i}"}
+            for i, created in enumerate(tweets)]
+
+
+class StubRateLimit:
+    """Server-side request limit per window, shared by the stub clients given the same instance."""
+
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.lock = threading.Lock()
+        self.count = 0
+        self.reset_at = time.time() + window_seconds
+        self.rejected = 0
+
+    def hit(self):
+        with self.lock:
+            now = time.time()
+            if now >= self.reset_at:
+                self.count, self.reset_at = 0, now + self.window_seconds
+            self.count += 1
+            allowed = self.count <= self.limit
+            self.rejected += not allowed
+            headers = {"x-rate-limit-limit": str(self.limit),
+                       "x-rate-limit-remaining": str(max(self.limit - self.count, 0)),
+                       "x-rate-limit-reset": str(self.reset_at)}
+        return allowed, headers
+
+
+class StubSearchClient:
+    def __init__(self, timeline, fail_after=None, rate_limit=None, scheduler=None, latency=0.0):
+        self.timeline = timeline
+        self.fail_after = fail_after
+        self.rate_limit = rate_limit
+        self.scheduler = scheduler
+        self.latency = latency
+        self.requests = 0
+
+    def search_recent_tweets(self, query, start_time, end_time, max_results=10, next_token=None, **kwargs):
+        if not 10 <= max_results <= 100:
+            raise ValueError("max_results must be between 10 and 100")
+        if self.scheduler:
+            self.scheduler.acquire(search_route)
+        if self.fail_after is not None and self.requests >= self.fail_after:
+            raise ConnectionError("Stub connection dropped")
+        self.requests += 1
+        time.sleep(self.latency)
+
+        headers = {}
+        if self.rate_limit:
+            allowed, headers = self.rate_limit.hit()
+            if not allowed:
+                response = requests.Response()
+                response.status_code, response.headers, response._content = 429, headers, b"{}"
+                if self.scheduler:
+                    self.scheduler.update(search_route, headers, exhausted=True)
+                raise tweepy.TooManyRequests(response)
+
+        start, end = parse_iso(start_time), parse_iso(end_time)
+        matches = [t for t in reversed(self.timeline) if start <= t["created_at"] < end]
+        offset = int(next_token or 0)
+        page = matches[offset:offset + max_results]
+        data = [tweepy.Tweet({"id": str(t["id"]), "text": t["text"], "author_id": str(t["author_id"]),
+                              "created_at": t["created_at"].strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                              "edit_history_tweet_ids": [str(t["id"])]}) for t in page]
+        meta = {"result_count": len(page)}
+        if offset + max_results < len(matches):
+            meta["next_token"] = str(offset + max_results)
+        if self.scheduler and headers:
+            self.scheduler.update(search_route, headers)
+        return tweepy.Response(data or None, {}, [], meta)
+
+
+def check_fetched(save_location, timeline):
+    files = [f for f in os.listdir(save_location) if f.endswith(".csv")]
+    ids = pd.concat([pd.read_csv(os.path.join(save_location, f)) for f in files])["Tweet ID"]
+    missing = len({t["id"] for t in timeline} - set(ids))
+    print(f"{len(timeline)} stub tweets; fetched {len(ids)} in {len(files)} windows. "
+          f"Missing: {missing}, duplicated: {len(ids) - ids.nunique()}")
+
+
+if __name__ == "__main__":
+    start_time = datetime.datetime(2024, 11, 1, tzinfo=datetime.timezone.utc)
+    end_time = start_time + datetime.timedelta(days=stub_days)
+    timeline = make_timeline(start_time, stub_days, stub_seed)
+    query = "(fluoride) lang:en"
+
+    # 1. Concurrent segments, a dropped connection, and a resumed run
+    with tempfile.TemporaryDirectory() as save_location:
+        checkpoint_path = os.path.join(save_location, "fetch_checkpoint.jsonl")
+        interrupted = StubSearchClient(timeline, fail_after=40)
+        fetch_range(interrupted, query, start_time, end_time, save_location, checkpoint_path,
+                    max_workers=4, max_attempts=2, retry_delay=0.1)
+        resumed = StubSearchClient(timeline)
+        fetch_range(resumed, query, start_time, end_time, save_location, checkpoint_path, max_workers=4)
+        print(f"Requests: {interrupted.requests} before the drop, {resumed.requests} after resuming")
+        check_fetched(save_location, timeline)
+
+    # 2. Two collectors on one budget file against a shared server limit of 40 requests per 3 seconds
+    with tempfile.TemporaryDirectory() as work_dir:
+        server = StubRateLimit(40, 3)
+        budget_path = os.path.join(work_dir, "rate_budget.sqlite")
+        clients = {}
+
+        def collect(name):
+            save_location = os.path.join(work_dir, name)
+            os.makedirs(save_location)
+            client = StubSearchClient(timeline, rate_limit=server, latency=0.02,
+                                      scheduler=RateScheduler(budget_path, name, poll_seconds=0.05))
+            clients[name] = client
+            fetch_range(client, f"{query} {name}", start_time, end_time, save_location,
+                        os.path.join(save_location, "fetch_checkpoint.jsonl"), window=datetime.timedelta(minutes=10),
+                        target_tweets=50, max_workers=4)
+            check_fetched(save_location, timeline)
+
+        started = time.time()
+        threads = [threading.Thread(target=collect, args=(name,)) for name in ["main", "users"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(f"Shared budget: {', '.join(f'{n} {c.requests} requests' for n, c in clients.items())}, "
+              f"{server.rejected} rejected by the server, {time.time() - started:.1f}s")
+
+    # 3. Overlapping runs into one store, plus a one-time import of a CSV folder covering the same tweets
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = TweetStore(os.path.join(work_dir, "tweets.sqlite"))
+        for run, hours in enumerate([48, 72]):
+            fetch_range(StubSearchClient(timeline), query, start_time, start_time + datetime.timedelta(hours=hours),
+                        work_dir, os.path.join(work_dir, f"checkpoint_{run}.jsonl"), max_workers=4, store=store)
+        csv_dir = os.path.join(work_dir, "csv")
+        os.makedirs(csv_dir)
+        fetch_range(StubSearchClient(timeline), query, start_time, end_time, csv_dir,
+                    os.path.join(work_dir, "checkpoint_csv.jsonl"), max_workers=4)
+        imported = store.import_csv_folder(csv_dir)
+        ids = store.select(["Tweet ID"])["Tweet ID"]
+        print(f"Store: {len(ids)} tweets ({imported} added by the CSV import), "
+              f"missing: {len({t['id'] for t in timeline} - set(ids))}, "
+              f"{len(store.author_ids())} distinct authors over {len(store.counts_by_day())} days")
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+from contextlib import closing
+import threading
+import pandas as pd
+
+"""
+tweet_store.py
+
+One deduplicated store for the tweets pulled by main.py and getUserTweets.py, in place of a CSV per window:
+1. A single SQLite file with Tweet ID as the primary key, so overlapping windows and repeated runs never
+   add a tweet twice; both collectors (and their worker threads) can append to the same file
+2. Rows are partitioned by the UTC day of Created At (an indexed day column), so a date range is read
+   without scanning the rest, and Author ID is indexed for the distinct-author projection
+3. Projections return only the requested columns, in the CSV column names the rest of the code uses:
+   author_ids() for getNames.py, uncleaned() / mark_cleaned() for texts the preprocessing has not seen yet,
+   select() and export_csv() for anything else
+4. import_csv_folder() loads existing per-window CSV folders once; files already imported are skipped
+Run this file directly to import a folder of CSVs.
+"""
+
+# Store columns and the CSV columns they hold
+columns = {
+    "Tweet ID": "tweet_id",
+    "Text": "text",
+    "Author ID": "author_id",
+    "Created At": "created_at",
+    "Source": "source",
+    "Language": "language",
+    "Possibly Sensitive": "possibly_sensitive",
+    "Referenced Tweets": "referenced_tweets",
+    "Reply Settings": "reply_settings",
+    "Public Metrics": "public_metrics"
+}
+
+
+def _text(value):
+    # Objects (public metrics dicts, referenced tweet lists) are stored as they appeared in the CSVs
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def _flag(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, str):
+        return int(value.strip().lower() == "true")
+    return int(bool(value))
+
+
+def _projection(fields, prefix=""):
+    return ", ".join(f'{prefix}{columns[field]} AS "{field}"' for field in fields)
+
+
+def store_row(row):
+    """Store tuple for a tweet_row()-style dict (or a CSV row with the same column names)."""
+    created_at = pd.Timestamp(row["Created At"])
+    created_at = created_at.tz_localize("UTC") if created_at.tzinfo is None else created_at.tz_convert("UTC")
+    return (int(row["Tweet ID"]), _text(row["Text"]), int(row["Author ID"]),
+            created_at.strftime("%Y-%m-%dT%H:%M:%SZ"), created_at.strftime("%Y-%m-%d"),
+            _text(row.get("Source")), _text(row.get("Language")), _flag(row.get("Possibly Sensitive")),
+            _text(row.get("Referenced Tweets")), _text(row.get("Reply Settings")), _text(row.get("Public Metrics")))
+
+
+class TweetStore:
+    """SQLite tweet store, safe to share between worker threads and between collector processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        self.conn.execute("PRAGMA journal_mode=WAL")  # Readers do not block the collectors
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS tweets (
+                                 tweet_id INTEGER PRIMARY KEY,
+                                 text TEXT,
+                                 author_id INTEGER NOT NULL,
+                                 created_at TEXT NOT NULL,
+                                 day TEXT NOT NULL,
+                                 source TEXT,
+                                 language TEXT,
+                                 possibly_sensitive INTEGER,
+                                 referenced_tweets TEXT,
+                                 reply_settings TEXT,
+                                 public_metrics TEXT)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tweets_day ON tweets (day)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tweets_author ON tweets (author_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cleaned (tweet_id INTEGER PRIMARY KEY)")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS imported_files (
+                                 path TEXT PRIMARY KEY, size INTEGER, mtime REAL, tweets INTEGER)""")
+        self.conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+
+    def _read(self, sql, params=(), chunksize=None):
+        # Reads use their own connection (WAL lets them run beside the writers), closed once the read is done
+        if chunksize is None:
+            with closing(self._connect()) as conn:
+                return pd.read_sql_query(sql, conn, params=params)
+        return self._read_chunks(sql, params, chunksize)
+
+    def _read_chunks(self, sql, params, chunksize):
+        with closing(self._connect()) as conn:
+            yield from pd.read_sql_query(sql, conn, params=params, chunksize=chunksize)
+
+    def add(self, rows):
+        """Inserts tweet_row()-style dicts, ignoring Tweet IDs already stored. Returns the number added."""
+        values = [store_row(row) for row in rows]
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(f"INSERT OR IGNORE INTO tweets VALUES ({', '.join('?' * 11)})", values)
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def _where(self, start_day, end_day):
+        # Day range [start_day, end_day), as YYYY-MM-DD strings
+        clauses, params = [], []
+        if start_day:
+            clauses.append("day >= ?")
+            params.append(str(start_day))
+        if end_day:
+            clauses.append("day < ?")
+            params.append(str(end_day))
+        return clauses, params
+
+    def select(self, fields=("Tweet ID", "Text"), start_day=None, end_day=None, chunksize=None):
+        """DataFrame (or an iterator of DataFrames of chunksize rows) of the given CSV columns."""
+        clauses, params = self._where(start_day, end_day)
+        sql = (f"SELECT {_projection(fields)} FROM tweets"
+               f"{' WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY tweet_id")
+        return self._read(sql, params, chunksize)
+
+    def author_ids(self):
+        """Distinct Author IDs, read from the author index alone."""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT author_id FROM tweets")]
+
+    def uncleaned(self, fields=("Tweet ID", "Text"), chunksize=None):
+        """The given columns for tweets not yet passed to mark_cleaned()."""
+        sql = (f"SELECT {_projection(fields, 't.')} FROM tweets t "
+               f"LEFT JOIN cleaned c ON c.tweet_id = t.tweet_id WHERE c.tweet_id IS NULL ORDER BY t.tweet_id")
+        return self._read(sql, chunksize=chunksize)
+
+    def mark_cleaned(self, tweet_ids):
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO cleaned VALUES (?)", [(int(i),) for i in tweet_ids])
+            self.conn.commit()
+
+    def counts_by_day(self):
+        return self._read("SELECT day, COUNT(*) AS tweets FROM tweets GROUP BY day ORDER BY day")
+
+    def export_csv(self, path, start_day=None, end_day=None, chunksize=100000):
+        """Writes the stored tweets (optionally one day range) to a CSV with the collectors' columns."""
+        header = True
+        for chunk in self.select(list(columns), start_day, end_day, chunksize=chunksize):
+            chunk.to_csv(path, mode="w" if header else "a", header=header, index=False)
+            header = False
+        if header:
+            pd.DataFrame(columns=list(columns)).to_csv(path, index=False)
+
+    def import_csv_folder(self, folder_path):
+        """One-time import of a folder of per-window CSVs; files already imported unchanged are skipped."""
+        imported = {row[0]: (row[1], row[2]) for row in
+                    self.conn.execute("SELECT path, size, mtime FROM imported_files")}
+        total_added = 0
+        for file_name in sorted(f for f in os.listdir(folder_path) if f.endswith(".csv")):
+            full_path = os.path.abspath(os.path.join(folder_path, file_name))
+            stat = os.stat(full_path)
+            if imported.get(full_path) == (stat.st_size, stat.st_mtime):
+                continue
+            try:
+                df = pd.read_csv(full_path, dtype={"Tweet ID": "Int64", "Author ID": "Int64"})
+                df = df.dropna(subset=["Tweet ID", "Author ID", "Created At"])
+                added = self.add(df.to_dict("records"))
+            except Exception as e:
+                print(f"Failed to import {file_name}: {e}")
+                continue
+            with self.lock:
+                self.conn.execute("INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?, ?)",
+                                  (full_path, stat.st_size, stat.st_mtime, added))
+                self.conn.commit()
+            total_added += added
+            print(f"{file_name}: {added} new of {len(df)} tweets")
+        return total_added
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    # One-time import of the CSV folders written before the store existed
+    store_path = r"path/to/tweets.sqlite"
+    csv_folders = [r"path/to/mainfolder", r"path/to/fluoride_dataset"]
+    store = TweetStore(store_path)
+    for folder in csv_folders:
+        print(f"Imported {store.import_csv_folder(folder)} new tweets from {folder}")
+    print(store.counts_by_day().to_string(index=False))
+    store.close()
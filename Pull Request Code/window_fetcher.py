@@ -0,0 +1,227 @@
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import tweepy
+
+"""
+window_fetcher.py
+
+Gap-free search of a time range in windows, used by main.py:
+1. Every window follows next_token through all of its pages, so busy windows are never truncated
+2. Window width adapts to the observed tweet rate: after a window that came back full (more than
+   target_tweets) the following windows are split narrower, after sparse ones they are merged wider,
+   so the request count follows the real tweet volume instead of the number of fixed windows
+3. Each finished window is appended to a checkpoint file; a restart fetches only the parts of the range
+   that no recorded window for the same query covers
+4. The uncovered range is cut into segments that run concurrently (max_workers). A segment whose window
+   fails is requeued from that window on, so a failure never leaves a gap; the request budget itself is
+   enforced by the client (rate_scheduler.ScheduledClient)
+5. Windows are appended to a tweet_store.TweetStore when one is given (duplicates dropped by Tweet ID),
+   otherwise each window is written to its own CSV in save_location
+
+The client only needs a tweepy.Client-style search_recent_tweets(), so stub_search.py can stand in for the API.
+"""
+
+tweet_fields = ["id", "text", "author_id", "created_at", "public_metrics", "source",
+                "lang", "geo", "possibly_sensitive", "referenced_tweets", "reply_settings"]
+user_fields = ["id", "name", "username", "created_at", "location", "verified", "description", "public_metrics"]
+tweet_columns = ["Tweet ID", "Text", "Author ID", "Created At", "Source", "Language", "Possibly Sensitive",
+                 "Referenced Tweets", "Reply Settings", "Public Metrics"]
+
+
+def iso(t):
+    # ISO 8601 string with UTC 'Z' suffix
+    return t.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_iso(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.timezone.utc)
+
+
+def tweet_row(tweet):
+    return {
+        "Tweet ID": tweet.id,
+        "Text": tweet.text,
+        "Author ID": tweet.author_id,
+        "Created At": tweet.created_at,
+        "Source": tweet.source,
+        "Language": tweet.lang,
+        "Possibly Sensitive": tweet.possibly_sensitive,
+        "Referenced Tweets": tweet.referenced_tweets,
+        "Reply Settings": tweet.reply_settings,
+        "Public Metrics": tweet.public_metrics
+    }
+
+
+def fetch_window(client, query, start_time, end_time, page_size=100):
+    """All tweets in [start_time, end_time), following next_token. Returns (rows, pages requested)."""
+    rows = []
+    pages = 0
+    next_token = None
+    while True:
+        response = client.search_recent_tweets(
+            query=query,
+            start_time=iso(start_time),
+            end_time=iso(end_time),
+            max_results=page_size,
+            next_token=next_token,
+            tweet_fields=tweet_fields,
+            user_fields=user_fields
+        )
+        pages += 1
+        rows += [tweet_row(tweet) for tweet in response.data or []]
+        next_token = (response.meta or {}).get("next_token")
+        if not next_token:
+            return rows, pages
+
+
+def window_filename(start_time, end_time):
+    start_date, end_date = iso(start_time), iso(end_time)
+    return f"tweets_{start_date.replace(':', '').replace('T', '_')}_to_{end_date.replace(':', '').replace('T', '_')}.csv"
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of finished windows (safe to share between worker threads)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def records(self, query):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as file:
+            lines = [json.loads(line) for line in file if line.strip()]
+        return [record for record in lines if record["query"] == query]
+
+    def missing(self, query, start_time, end_time):
+        """Sub-intervals of [start_time, end_time) not covered by any recorded window."""
+        gaps = []
+        cursor = start_time
+        for record in sorted(self.records(query), key=lambda r: r["start"]):
+            window_start, window_end = parse_iso(record["start"]), parse_iso(record["end"])
+            if window_start > cursor:
+                gaps.append((cursor, min(window_start, end_time)))
+            cursor = max(cursor, window_end)
+            if cursor >= end_time:
+                break
+        if cursor < end_time:
+            gaps.append((cursor, end_time))
+        return [(a, b) for a, b in gaps if a < b]
+
+    def record(self, query, start_time, end_time, tweets, pages, file_name):
+        line = {"query": query, "start": iso(start_time), "end": iso(end_time), "tweets": tweets,
+                "pages": pages, "file": file_name}
+        with self.lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(line) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class SegmentFailed(Exception):
+    """A window failed; the segment can be retried from resume_time."""
+
+    def __init__(self, resume_time, cause):
+        super().__init__(str(cause))
+        self.resume_time = resume_time
+        self.cause = cause
+
+
+def next_width(width, tweets, target_tweets, min_width, max_width):
+    """Width for the next window: scaled towards target_tweets, at most halved or doubled per step."""
+    if tweets == 0:
+        scaled = width * 2
+    else:
+        scaled = min(max(width * target_tweets / tweets, width / 2), width * 2)
+    return min(max(scaled, min_width), max_width)
+
+
+def fetch_segment(client, query, start_time, end_time, save_location, checkpoint, window, min_window, max_window,
+                  target_tweets, page_size, store=None):
+    """Fetches [start_time, end_time) in adaptive windows. Returns (tweets, requests); raises SegmentFailed."""
+    total_tweets = 0
+    total_requests = 0
+    while start_time < end_time:
+        window_end = min((start_time + window).replace(microsecond=0), end_time)
+        try:
+            rows, pages = fetch_window(client, query, start_time, window_end, page_size)
+        except Exception as e:
+            raise SegmentFailed(start_time, e)
+
+        if store is not None:
+            file_name = os.path.basename(store.path)
+            added = store.add(rows)
+            print(f"{len(rows)} tweets in {pages} request(s) from {iso(start_time)}, {added} new in {file_name}")
+        else:
+            file_name = window_filename(start_time, window_end)
+            pd.DataFrame(rows, columns=tweet_columns).to_csv(os.path.join(save_location, file_name), index=False)
+            print(f"{len(rows)} tweets in {pages} request(s) saved to {file_name}")
+        checkpoint.record(query, start_time, window_end, len(rows), pages, file_name)
+
+        total_tweets += len(rows)
+        total_requests += pages
+        window = next_width(window, len(rows), target_tweets, min_window, max_window)
+        start_time = window_end
+    return total_tweets, total_requests
+
+
+def split_range(gaps, segment):
+    parts = []
+    for start_time, end_time in gaps:
+        while start_time < end_time:
+            parts.append((start_time, min(start_time + segment, end_time)))
+            start_time = parts[-1][1]
+    return parts
+
+
+def fetch_range(client, query, start_time, end_time, save_location, checkpoint_path,
+                window=datetime.timedelta(hours=1), min_window=datetime.timedelta(minutes=1),
+                max_window=datetime.timedelta(days=1), target_tweets=500, page_size=100,
+                max_workers=1, segment=datetime.timedelta(hours=6), max_attempts=5, retry_delay=30, store=None):
+    """
+    Fetches the parts of [start_time, end_time) the checkpoint does not cover into store (or save_location,
+    one CSV per window, when store is None), with up to max_workers segments in flight. Failed segments are requeued from the
+    failed window (rate-limit errors straight away, others after retry_delay x attempt seconds) until
+    max_attempts; whatever is still missing is fetched on the next run. Returns (tweets, requests).
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    # The API takes whole seconds
+    start_time, end_time = start_time.replace(microsecond=0), end_time.replace(microsecond=0)
+    gaps = checkpoint.missing(query, start_time, end_time)
+    if gaps != [(start_time, end_time)]:
+        print(f"Checkpoint covers part of the range; fetching {len(gaps)} uncovered interval(s)")
+    queue = [(a, b, 1, 0) for a, b in split_range(gaps, segment)]  # (start, end, attempt, delay)
+
+    def run(segment_start, segment_end, delay):
+        time.sleep(delay)
+        return fetch_segment(client, query, segment_start, segment_end, save_location, checkpoint,
+                             window, min_window, max_window, target_tweets, page_size, store)
+
+    total_tweets = 0
+    total_requests = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        while queue or running:
+            while queue and len(running) < max_workers:
+                segment_start, segment_end, attempt, delay = queue.pop(0)
+                running[pool.submit(run, segment_start, segment_end, delay)] = (segment_end, attempt)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                segment_end, attempt = running.pop(future)
+                try:
+                    tweets, requests = future.result()
+                    total_tweets += tweets
+                    total_requests += requests
+                except SegmentFailed as e:
+                    if attempt >= max_attempts:
+                        print(f"Giving up on {iso(e.resume_time)} to {iso(segment_end)} after {attempt} attempts: {e}")
+                        continue
+                    delay = 0 if isinstance(e.cause, tweepy.TooManyRequests) else retry_delay * attempt
+                    print(f"Window from {iso(e.resume_time)} failed ({e}); requeued (attempt {attempt + 1})")
+                    queue.append((e.resume_time, segment_end, attempt + 1, delay))
+
+    return total_tweets, total_requests